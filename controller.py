@@ -1,12 +1,56 @@
-import subprocess
+import asyncio
+import codecs
+import locale
 import os
 import time
 import sys
 import shlex
 
 results = []  # 保存每一步执行结果
+ENCODING = locale.getpreferredencoding(False)  # 子进程输出/输入使用的编码（与 text=True 时一致）
+PARTIAL_LINE_DELAY = 0.2  # 不完整的行等待后续输出的秒数
+
+async def stream_output(stream, prefix):
+    """
+    按块读取子进程输出并加上步骤前缀转发到 stdout，每块只 write/flush 一次。
+    不完整的行先暂存，避免并发步骤的输出在行中间交错；若短时间内没有后续输出
+    （如 input 提示符），则直接显示。
+    """
+    decoder = codecs.getincrementaldecoder(ENCODING)(errors="replace")
+    pending = ""
+    at_line_start = True
+    while True:
+        try:
+            chunk = await asyncio.wait_for(stream.read(65536), timeout=PARTIAL_LINE_DELAY if pending else None)
+        except asyncio.TimeoutError:
+            sys.stdout.write((prefix if at_line_start else "") + pending)
+            sys.stdout.flush()
+            pending = ""
+            at_line_start = False
+            continue
+
+        text = pending + decoder.decode(chunk, final=not chunk)
+        pending = ""
+        if chunk:
+            # 只按 "\n" 断行：最后一个换行之后的不完整部分暂存，其余整行输出
+            cut = text.rfind("\n") + 1
+            text, pending = text[:cut], text[cut:]
+        pieces = text.split("\n")
+        lines = [piece + "\n" for piece in pieces[:-1]]
+        if pieces[-1]:
+            lines.append(pieces[-1])
+        out = []
+        for piece in lines:
+            out.append((prefix if at_line_start else "") + piece)
+            at_line_start = piece.endswith("\n")
+        if out:
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
+        if not chunk:
+            break
 
-def run_command(step, total, description, cmd, input_data=None):
+
+async def run_command(step, total, description, cmd, input_data=None):
     """运行命令并实时输出日志；自动识别 .py/.exe/.bat 等类型并处理"""
     print(f"\n[步骤 {step}/{total}] {description}")
     cmd_list = cmd if isinstance(cmd, list) else [cmd]
@@ -46,41 +90,34 @@ def run_command(step, total, description, cmd, input_data=None):
     try:
         if os.path.basename(target).lower() == "rsas2check.exe":
             os.makedirs(os.path.join(exe_dir, "combined_reports"), exist_ok=True)
+        stdin = asyncio.subprocess.PIPE if input_data else None
         if use_shell:
-            proc = subprocess.Popen(
+            proc = await asyncio.create_subprocess_shell(
                 actual_cmd,
                 cwd=exe_dir,
-                stdin=subprocess.PIPE if input_data else None,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                shell=True,
-                bufsize=1
+                stdin=stdin,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
             )
         else:
-            proc = subprocess.Popen(
-                actual_cmd,
+            proc = await asyncio.create_subprocess_exec(
+                *actual_cmd,
                 cwd=exe_dir,
-                stdin=subprocess.PIPE if input_data else None,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                shell=False,
-                bufsize=1
+                stdin=stdin,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
             )
 
         if input_data:
             try:
-                proc.stdin.write(input_data)
-                proc.stdin.flush()
+                proc.stdin.write(input_data.encode(ENCODING))
+                await proc.stdin.drain()
                 proc.stdin.close()
             except Exception:
                 pass
-        for line in proc.stdout:
-            sys.stdout.write(line)
-            sys.stdout.flush()
+        await stream_output(proc.stdout, f"[{step}] ")
 
-        proc.wait()
+        await proc.wait()
         if proc.returncode == 0:
             results.append((step, description, "✅ 成功"))
         else:
@@ -97,7 +134,16 @@ def run_command(step, total, description, cmd, input_data=None):
         print(f"[INFO] 步骤 {step} 耗时 {cost} 秒")
 
 
-def main():
+async def run_chain(total, *steps):
+    """按顺序执行一组存在先后依赖的步骤"""
+    for step in steps:
+        if len(step) == 3:
+            await run_command(step[0], total, step[1], step[2])
+        elif len(step) == 4:
+            await run_command(step[0], total, step[1], step[2], input_data=step[3])
+
+
+async def main():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     total_steps = 7
 
@@ -111,16 +157,26 @@ def main():
         (6, "运行 rsas.py", [sys.executable, os.path.join(base_dir, "整理结果", "RSAS", "rsas.py")]),
         (7, "运行 nmap.bat", [os.path.join(base_dir, "整理结果", "nmap", "nmap.py")])
     ]
+    steps = {step[0]: step for step in steps}
 
-    for step in steps:
-        if len(step) == 3:
-            run_command(step[0], total_steps, step[1], step[2])
-        elif len(step) == 4:
-            run_command(step[0], total_steps, step[1], step[2], input_data=step[3])
+    # move.py 负责分发输入文件，必须最先执行
+    await run_chain(total_steps, steps[1])
+
+    # rsas.py 追加写入 nessus 生成的 中高危漏洞.xlsx，并读取 rsas2check 的输出，需等待两者完成
+    async def rsas_chain():
+        await asyncio.gather(run_chain(total_steps, steps[2]), run_chain(total_steps, steps[5]))
+        await run_chain(total_steps, steps[6])
+
+    # 其余步骤的输入目录互不相关，并发执行；awvs.py 依赖 AwvsReport 的输出
+    await asyncio.gather(
+        rsas_chain(),
+        run_chain(total_steps, steps[3], steps[4]),
+        run_chain(total_steps, steps[7]),
+    )
 
     # 执行结果总结
     print("\n========== 执行结果总结 ==========")
-    for step, desc, status in results:
+    for step, desc, status in sorted(results):
         print(f"[步骤 {step}] {desc} -> {status}")
     print("================================")
 
@@ -128,4 +184,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
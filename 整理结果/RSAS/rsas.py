@@ -2,13 +2,28 @@ import os
 import sys
 import re
 import difflib
+import functools
 import pandas as pd
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 import shutil
 import tempfile
 
+# openpyxl 在安装了 lxml 时会自动使用其进行 XML 序列化，保存速度明显更快
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    print("[WARN] 未安装 lxml，openpyxl 将退回标准库 XML 序列化（较慢），建议 pip install lxml")
+
+# 读取 Excel 优先使用 Rust 实现的 calamine 引擎（pip install python-calamine），未安装时回退 openpyxl
+try:
+    import python_calamine  # noqa: F401
+    _READ_ENGINE = "calamine"
+except ImportError:
+    _READ_ENGINE = "openpyxl"
+
 TARGET_COLS = ["序号", "IP", "端口", "漏洞名称", "风险等级", "漏洞说明", "加固建议", "CVE"]
 
 COLUMN_CANDIDATES = {
@@ -22,16 +37,28 @@ COLUMN_CANDIDATES = {
     "CVE": ["CVE", "漏洞CVE编号", "CVE编号", "cve id", "漏洞CVE"]
 }
 
+# 表格样式（模块级常量，避免每次写入/每个单元格重复构造）
+_HEADER_FONT = Font(bold=True)
+_HEADER_FILL = PatternFill("solid", fgColor="DDDDDD")
+_CENTER = Alignment(horizontal="center", vertical="center", wrap_text=True)
+_WRAP = Alignment(wrap_text=True, vertical="top")
+_TOP = Alignment(vertical="top")
+_THIN = Side(border_style="thin", color="CCCCCC")
+_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_WRAP_COLS = ("漏洞说明", "加固建议")
+
+# normalize 需要删除的空白与标点（单次 C 级 translate，替代正则 re.sub）
+_DELETE_CHARS = str.maketrans('', '', ' \t\n\r\x0b\x0c\u3000\xa0_：:，,。.-')
+
+@functools.lru_cache(maxsize=4096)
 def normalize(s: str) -> str:
     if s is None:
         return ""
     s = str(s)
     s = s.strip().lower()
-    s = re.sub(r'[\s_：:，,。\.\-]+', '', s)
-    return s
+    return s.translate(_DELETE_CHARS)
 
-def find_best_col_for_target(target_keywords, columns):
-    norm_map = {normalize(c): c for c in columns}
+def find_best_col_for_target(target_keywords, norm_map):
     norms = list(norm_map.keys())
     for kw in target_keywords:
         nk = normalize(kw)
@@ -48,11 +75,13 @@ def find_best_col_for_target(target_keywords, columns):
             return norm_map[best[0]]
     return None
 
+_ZHG_RE = re.compile(r'[中高]')
+
 def is_zhong_or_gao(val):
     if pd.isna(val):
         return False
     s = str(val).strip()
-    return bool(re.search(r'[中高]', s))
+    return bool(_ZHG_RE.search(s))
 
 def ensure_output_dir(script_dir):
     parent = os.path.dirname(script_dir)
@@ -66,10 +95,12 @@ def ensure_output_dir(script_dir):
 def align_df_to_target(df_src, target_cols, src_columns=None):
     if src_columns is None:
         src_columns = list(df_src.columns)
+    # 源列的归一化映射对所有目标列都相同，只构建一次
+    norm_map = {normalize(c): c for c in src_columns}
     aligned = pd.DataFrame()
     for tgt in target_cols:
         candidates = COLUMN_CANDIDATES.get(tgt, [tgt])
-        found = find_best_col_for_target(candidates, src_columns)
+        found = find_best_col_for_target(candidates, norm_map)
         if found and found in df_src.columns:
             aligned[tgt] = df_src[found]
         elif tgt in df_src.columns:
@@ -78,80 +109,67 @@ def align_df_to_target(df_src, target_cols, src_columns=None):
             aligned[tgt] = ""
     return aligned
 
-def write_and_format_excel(df, path):
-    df.to_excel(path, index=False, engine="openpyxl")
-    wb = load_workbook(path)
-    ws = wb.active
-
-    header_font = Font(bold=True)
-    header_fill = PatternFill("solid", fgColor="DDDDDD")
-    center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    wrap = Alignment(wrap_text=True, vertical="top")
-    thin = Side(border_style="thin", color="CCCCCC")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-    max_col = ws.max_column
-    max_row = ws.max_row
-    for col_idx in range(1, max_col + 1):
-        cell = ws.cell(row=1, column=col_idx)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center
-        cell.border = border
-
-    col_name_to_idx = { ws.cell(row=1, column=i).value: i for i in range(1, max_col+1) }
-    for cname in ["漏洞说明", "加固建议"]:
-        if cname in col_name_to_idx:
-            cidx = col_name_to_idx[cname]
-            for r in range(2, max_row+1):
-                ws.cell(row=r, column=cidx).alignment = wrap
-                ws.cell(row=r, column=cidx).border = border
-
-    for r in range(2, max_row+1):
-        for c in range(1, max_col+1):
-            cell = ws.cell(row=r, column=c)
-            cell.alignment = Alignment(vertical="top", wrap_text=(cell.alignment.wrapText if cell.alignment else False))
-            cell.border = border
+def column_widths(df):
+    """按列内容（含表头）的最大字符数计算列宽，上限 60。"""
+    data_len = df.astype(object).fillna("").astype(str).apply(lambda col: col.str.len()).max()
+    header_len = pd.Series([len(str(c)) for c in df.columns], index=df.columns)
+    widths = pd.concat([data_len, header_len], axis=1).max(axis=1).clip(upper=56) + 4
+    return [int(w) for w in widths]
 
+def write_and_format_excel(df, path):
+    # write-only 模式流式写入，避免 to_excel 后再 load_workbook 逐格设置样式
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
     ws.freeze_panes = "A2"
 
-    for col_idx in range(1, max_col + 1):
-        col_letter = get_column_letter(col_idx)
-        max_len = 0
-        for cell in ws[col_letter]:
-            if cell.value is None:
-                l = 0
-            else:
-                l = len(str(cell.value))
-            if l > max_len:
-                max_len = l
-        adjusted_width = min(max_len + 4, 60)
-        ws.column_dimensions[col_letter].width = adjusted_width
-
-    try:
-        ws.auto_filter.ref = ws.dimensions
-    except Exception:
-        pass
+    # 列宽必须在写入数据行之前设置，直接从 DataFrame 计算
+    for col_idx, width in enumerate(column_widths(df), start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    header_cells = []
+    for cname in df.columns:
+        cell = WriteOnlyCell(ws, value=cname)
+        cell.font = _HEADER_FONT
+        cell.fill = _HEADER_FILL
+        cell.alignment = _CENTER
+        cell.border = _BORDER
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    # 正文样式注册为 NamedStyle，单元格只引用样式名，不再逐格赋值 alignment/border
+    wb.add_named_style(NamedStyle(name="body_wrap", alignment=_WRAP, border=_BORDER))
+    wb.add_named_style(NamedStyle(name="body_top", alignment=_TOP, border=_BORDER))
+    styles = ["body_wrap" if cname in _WRAP_COLS else "body_top" for cname in df.columns]
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        row_cells = []
+        for v, style in zip(row, styles):
+            cell = WriteOnlyCell(ws, value=v)
+            cell.style = style
+            row_cells.append(cell)
+        ws.append(row_cells)
+
+    # 筛选范围直接由 DataFrame 尺寸得出；没有数据行或列时不设置
+    if len(df) and len(df.columns):
+        ws.auto_filter.ref = f"A1:{get_column_letter(len(df.columns))}{len(df) + 1}"
 
     wb.save(path)
 
 def find_latest_zip(search_dir: str, exclude_name: str = "绿盟.zip"):
+    # os.scandir 的 DirEntry 缓存了文件类型与 stat 信息，避免逐个 isfile/getmtime
     candidates = []
     try:
-        for fname in os.listdir(search_dir):
-            if not fname.lower().endswith('.zip'):
-                continue
-            if fname == exclude_name:
-                continue
-            full = os.path.join(search_dir, fname)
-            if os.path.isfile(full):
-                candidates.append(full)
+        with os.scandir(search_dir) as it:
+            for entry in it:
+                if not entry.name.lower().endswith('.zip') or entry.name == exclude_name:
+                    continue
+                if entry.is_file():
+                    candidates.append((entry.stat().st_mtime, entry.path))
     except FileNotFoundError:
         return None
     if not candidates:
         return None
-    candidates.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-    return candidates[0]
+    return max(candidates)[1]
 
 def copy_atomic_to_dest(src_path: str, dest_dir: str, dest_name: str = "绿盟.zip"):
     if not os.path.isfile(src_path):
@@ -162,8 +180,7 @@ def copy_atomic_to_dest(src_path: str, dest_dir: str, dest_name: str = "绿盟.z
     tmp_name = tmp.name
     tmp.close()
     try:
-        with open(src_path, 'rb') as fr, open(tmp_name, 'wb') as fw:
-            shutil.copyfileobj(fr, fw)
+        shutil.copyfile(src_path, tmp_name)
         os.replace(tmp_name, dest_path)
     except Exception:
         try:
@@ -186,35 +203,47 @@ def main():
     zhg_path = os.path.join(output_dir, "中高危漏洞.xlsx")
 
     try:
-        df_src = pd.read_excel(input_path, engine="openpyxl")
+        df_src = pd.read_excel(input_path, engine=_READ_ENGINE)
     except Exception as e:
         print(f"[ERROR] 读取源文件失败：{e}")
         sys.exit(1)
 
     df_aligned = align_df_to_target(df_src, TARGET_COLS, src_columns=list(df_src.columns))
+    # 风险等级取值很少（高/中/低/信息），转为 category 以减少内存并加速后续筛选
+    df_aligned["风险等级"] = df_aligned["风险等级"].astype("category")
 
-    df_filtered = df_aligned[df_aligned["风险等级"].apply(is_zhong_or_gao)].copy().reset_index(drop=True)
+    # 只对少量类别做正则匹配，再按类别成员关系筛选，不把整列转回字符串
+    risk = df_aligned["风险等级"]
+    hit_levels = [c for c in risk.cat.categories if _ZHG_RE.search(str(c))]
+    mask = risk.isin(hit_levels)
+    df_filtered = df_aligned.loc[mask].reset_index(drop=True)
 
     def renumber(df):
         if "序号" not in df.columns:
-            df.insert(0, "序号", "")
+            df.insert(0, "序号", range(1, len(df) + 1))
+            return df
         df["序号"] = range(1, len(df) + 1)
-        cols = [c for c in df.columns if c != "序号"]
-        df = df[["序号"] + cols]
+        # 序号已在首列时无需重排（避免整表复制）
+        if df.columns[0] != "序号":
+            df = df.reindex(columns=["序号"] + [c for c in df.columns if c != "序号"])
         return df
 
     df_filtered = renumber(df_filtered)
 
-    try:
-        write_and_format_excel(df_filtered, sorted_path)
-        print(f"[*] 已保存整理文件（临时）：{sorted_path}")
-    except Exception as e:
-        print(f"[ERROR] 保存整理文件失败：{e}")
-        sys.exit(1)
+    # 整理文件仅用于调试核对，默认不再落盘；设置环境变量 RSAS_KEEP_TEMP 时才写出并保留
+    if os.environ.get("RSAS_KEEP_TEMP"):
+        try:
+            write_and_format_excel(df_filtered, sorted_path)
+            print(f"[*] 已保存整理文件：{sorted_path}")
+        except Exception as e:
+            print(f"[ERROR] 保存整理文件失败：{e}")
+            sys.exit(1)
+    else:
+        print(f"[*] 本次筛选出中高危记录：{len(df_filtered)} 条")
 
     if os.path.isfile(zhg_path):
         try:
-            df_exist = pd.read_excel(zhg_path, engine="openpyxl")
+            df_exist = pd.read_excel(zhg_path, engine=_READ_ENGINE)
             df_exist_aligned = align_df_to_target(df_exist, TARGET_COLS, src_columns=list(df_exist.columns))
             print(f"[*] 读取到了已存在的 中高危文件（{zhg_path}），原行数：{len(df_exist)}，映射后列：{list(df_exist_aligned.columns)}")
         except Exception as e:
@@ -227,8 +256,9 @@ def main():
     def drop_all_empty_rows(df):
         if df is None or df.shape[0] == 0:
             return df.copy()
-        mask = df.apply(lambda row: any((not pd.isna(v) and (not (isinstance(v, str) and v.strip() == ""))) for v in row), axis=1)
-        return df[mask].reset_index(drop=True)
+        stripped = df.astype(str).apply(lambda col: col.str.strip(), axis=0)
+        empty = df.isna() | (stripped == "")
+        return df.loc[~empty.all(axis=1)].reset_index(drop=True)
 
     exist_rows = drop_all_empty_rows(df_exist_aligned)
     new_rows = drop_all_empty_rows(df_filtered)
@@ -244,28 +274,18 @@ def main():
             print(f"[*] 已写入提示行并保存到：{zhg_path}")
         else:
             df_combined = pd.concat([exist_rows, new_rows], ignore_index=True, sort=False)
+            # 按 IP/端口/漏洞名称/CVE 去重，避免每次运行重复追加同一漏洞
+            key_cols = [c for c in ("IP", "端口", "漏洞名称", "CVE") if c in df_combined.columns]
+            if key_cols:
+                keys = df_combined[key_cols].astype(object).fillna("").astype(str).apply(lambda col: col.str.strip())
+                df_combined = df_combined.loc[~keys.duplicated(keep="first")].reset_index(drop=True)
             df_combined = renumber(df_combined[TARGET_COLS])
             write_and_format_excel(df_combined, zhg_path)
             print(f"[*] 已将追加结果保存到：{zhg_path}（总行数：{len(df_combined)})")
     except Exception as e:
         print(f"[ERROR] 写入 中高危漏洞.xlsx 失败：{e}")
-        try:
-            if os.path.isfile(sorted_path):
-                os.remove(sorted_path)
-                print(f"[*] 已删除临时整理文件：{sorted_path}")
-        except Exception:
-            pass
         sys.exit(1)
 
-    try:
-        if os.path.isfile(sorted_path):
-            os.remove(sorted_path)
-            print(f"[*] 已删除临时整理文件：{sorted_path}")
-        else:
-            print(f"[*] 临时整理文件未找到（可能已被删除或未生成）：{sorted_path}")
-    except Exception as e:
-        print(f"[WARN] 删除临时整理文件失败：{e}")
-
     print("[*] 全部操作完成。")
 
     try:
@@ -4,14 +4,18 @@ import sys
 import zipfile
 import shutil
 import tempfile
-import traceback
+import logging
 import re
 import json
+import codecs
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 import argparse
 import unicodedata
 import textwrap
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Optional deps
 try:
@@ -20,9 +24,28 @@ except Exception:
     pd = None
 
 try:
-    from bs4 import BeautifulSoup
+    from openpyxl import Workbook
+except Exception:
+    Workbook = None
+
+try:
+    from bs4 import BeautifulSoup, SoupStrainer
 except Exception:
     BeautifulSoup = None
+    SoupStrainer = None
+
+try:
+    import orjson
+
+    def _jloads(text):
+        # 大段嵌入 JSON 用 orjson 解析更快；orjson 不接受 NaN/Infinity、孤立代理字符与超过 64 位的整数，
+        # 这类内容退回标准库 json.loads，保证原本能解析的报告仍能解析
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            return json.loads(text)
+except Exception:
+    _jloads = json.loads
 
 try:
     from tqdm import tqdm
@@ -61,25 +84,40 @@ _COLOR = supports_color()
 
 def strip_ansi(s: str) -> str:
     """去掉 ANSI 控制码，用于准确计算可见长度"""
+    if '\x1b' not in s:
+        return s  # 无转义符时不必进入正则
     return _ansi_re.sub('', s)
 
+# 单字符显示宽度缓存（0/1/2），避免对同一字符反复调用 unicodedata
+_WIDTH_CACHE: Dict[str, int] = {}
+
+def _char_width(ch: str) -> int:
+    # 跳过不可见的组合字符（比如重音组合符）
+    if unicodedata.combining(ch):
+        w = 0
+    # 'F' (Fullwidth), 'W' (Wide) 视作 2 列；其余视作 1 列
+    elif unicodedata.east_asian_width(ch) in ('F', 'W'):
+        w = 2
+    else:
+        w = 1
+    _WIDTH_CACHE[ch] = w
+    return w
+
+@functools.lru_cache(maxsize=256)
 def visible_width(s: str) -> int:
     """
     计算字符串在终端中的可见列宽（考虑中文等宽字符为 2 列、组合字符为 0 列）。
     传入字符串可以包含 ANSI 码，函数会先移除 ANSI 码再计算。
+    横幅内容固定，整行结果同样做了缓存。
     """
     s2 = strip_ansi(s)
+    cache = _WIDTH_CACHE
     w = 0
     for ch in s2:
-        # 跳过不可见的组合字符（比如重音组合符）
-        if unicodedata.combining(ch):
-            continue
-        ea = unicodedata.east_asian_width(ch)
-        # 'F' (Fullwidth), 'W' (Wide) 视作 2 列；其余视作 1 列
-        if ea in ('F', 'W'):
-            w += 2
-        else:
-            w += 1
+        cw = cache.get(ch)
+        if cw is None:
+            cw = _char_width(ch)
+        w += cw
     return w
 
 def pad_visible(s: str, target_visible_len: int) -> str:
@@ -137,11 +175,12 @@ def print_banner(use_unicode: bool = True, outer_margin: int = 0, inner_pad: int
             else:
                 colored.append((c_bold + c_cyan + ln + c_reset) if _COLOR else ln)
 
-    # 计算可见最大宽度（使用 visible_width 来正确处理中文宽度）
-    content_max = max((visible_width(x) for x in colored), default=0)
+    # 计算可见宽度（使用 visible_width 来正确处理中文宽度），每行只算一次
+    widths = [visible_width(x) for x in colored]
+    content_max = max(widths, default=0)
 
     # 预先把每行（带颜色的）右侧填充到 content_max（保证每行实际可见宽度相同）
-    padded_lines = [pad_visible(ln, content_max) for ln in colored]
+    padded_lines = [ln + ' ' * (content_max - w) for ln, w in zip(colored, widths)]
 
     # line_content = inner_pad + padded_line + inner_pad
     total_inner = inner_pad * 2 + content_max
@@ -177,9 +216,15 @@ def print_banner(use_unicode: bool = True, outer_margin: int = 0, inner_pad: int
 def log(msg: str) -> None:
     print(msg)
 
+# 异常只交给 logging：堆栈在真正输出时才格式化，不再每次手动 format_exc
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
 def ensure_env():
     if pd is None:
         raise RuntimeError("pandas 未安装。请运行: pip install pandas openpyxl")
+    if Workbook is None:
+        raise RuntimeError("openpyxl 未安装。请运行: pip install openpyxl")
     if BeautifulSoup is None:
         raise RuntimeError("beautifulsoup4 未安装。请运行: pip install beautifulsoup4 lxml")
 
@@ -197,13 +242,23 @@ def unzip_all(zips: List[Path], tempdir: Path) -> List[Path]:
             log(f"解压失败 {z}: {e}")
     return out
 
+def _iter_files(directory: str, ext_set: frozenset):
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except OSError:
+        return  # 与 os.walk 一致：无法读取的目录直接跳过
+    for e in entries:
+        if e.is_dir(follow_symlinks=False):
+            yield from _iter_files(e.path, ext_set)
+        elif e.is_file():
+            name = e.name
+            dot = name.rfind('.')
+            if dot >= 0 and name[dot:].lower() in ext_set:
+                yield Path(e.path)
+
 def find_files(base: Path, exts: Tuple[str, ...]) -> List[Path]:
-    res = []
-    for root, _, files in os.walk(base):
-        for f in files:
-            if f.lower().endswith(exts):
-                res.append(Path(root) / f)
-    return res
+    return list(_iter_files(str(base), frozenset(x.lower() for x in exts)))
 
 # ----------------------------- HTML 解析 -----------------------------
 
@@ -217,17 +272,51 @@ HEADER_MAP = {
     'cve': {'cve','编号','cve编号','参考编号','reference','vul id'},
 }
 
+# 扫描嵌入脚本时只构建 <script> 标签；表格/文本回退需要完整 DOM（兄弟节点启发式依赖原始结构），不做过滤
+_SCRIPT_STRAINER = SoupStrainer('script') if SoupStrainer else None
+
 CVE_RE = re.compile(r'(CVE[-_:\s]*\d{4}[-_]\d{4,7})', re.I)
 IP_RE = re.compile(r'((?:\d{1,3}\.){3}\d{1,3})')
 PORT_RE = re.compile(r'(?:port|端口)[\s:：]*([0-9]{1,5})', re.I)
 SEV_INLINE_RE = re.compile(r'(高危|中危|低危|严重|高|中|低|high|medium|low)', re.I)
+_PORT_EXACT_RE = re.compile(r'^\d{1,5}$')
+_PORT_ANY_RE = re.compile(r'\d{1,5}')
+_TRAILING_COMMA_RE = re.compile(r',\s*(?=[}\]])')
+_SCRIPT_HINT_RE = re.compile(r'vul', re.I)
+_RISK_LEVEL_RE = re.compile(r'\b(4|5)\b')
+# 文本块一次扫描：IP / CVE / 端口 / 风险等级合并为一个交替正则，按 lastgroup 分派
+_BLOCK_TOKEN_RE = re.compile(
+    r'(?P<ip>(?:\d{1,3}\.){3}\d{1,3})'
+    r'|(?P<cve>CVE[-_:\s]*\d{4}[-_]\d{4,7})'
+    r'|(?:port|端口)[\s:：]*(?P<port>[0-9]{1,5})'
+    r'|(?P<sev>高危|中危|低危|严重|高|中|低|high|medium|low)', re.I)
+# 文本块预筛：不含这些子串的块不可能命中 CVE / 风险等级 / “漏洞”，也不含 IP
+_BLOCK_HINTS = ('漏洞', '高', '中', '低', '严重', '.')
+_BLOCK_HINTS_LOWER = ('cve', 'high', 'medium', 'low')
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.I)
+
+# 文本块中名称/描述/修复建议的标签识别
+_LABEL_MAP = {
+    '漏洞名称': re.compile(r'漏洞名称|名称|问题|title', re.I),
+    '漏洞说明': re.compile(r'漏洞说明|漏洞描述|描述|说明|description', re.I),
+    '加固建议': re.compile(r'加固建议|修复建议|整改建议|解决办法|处理建议|solution|remediation', re.I),
+}
 
+# 表头别名 -> 规范键 的倒排索引（同名别名以 HEADER_MAP 中靠前的为准）
+_HEADER_ALIAS_INDEX: Dict[str, str] = {}
+for _canon, _aliases in HEADER_MAP.items():
+    for _alias in _aliases:
+        _HEADER_ALIAS_INDEX.setdefault(_alias.lower(), _canon)
+
+# 表格行按规范列位置存放，避免每行构造 dict
+_CANON_COLS = ('ip', 'port', 'name', 'risk', 'desc', 'fix', 'cve')
+_CANON_INDEX = {k: i for i, k in enumerate(_CANON_COLS)}
+_VULN_COL_POS = frozenset(_CANON_INDEX[k] for k in ('name', 'risk', 'desc', 'fix', 'cve'))
+
+@functools.lru_cache(maxsize=4096)
 def normalize_key(k: str) -> str:
     k = (k or '').strip().lower()
-    for canon, aliases in HEADER_MAP.items():
-        if k in {a.lower() for a in aliases}:
-            return canon
-    return k
+    return _HEADER_ALIAS_INDEX.get(k, k)
 
 def _clean_text_list_or_str(v: Any) -> str:
     """把 list 或者形如 "['x', 'y']" 的字符串清成纯文本。"""
@@ -239,75 +328,71 @@ def _clean_text_list_or_str(v: Any) -> str:
 def extract_from_table(table) -> Tuple[List[Dict[str, Any]], List[Tuple[str,str]]]:
     """从一个 <table> 同时提取漏洞记录与端口记录。返回 (vuln_rows, port_pairs)。"""
     headers = [th.get_text(strip=True) for th in table.find_all('th')]
-    if not headers:
-        first = table.find('tr')
-        if first:
-            headers = [td.get_text(strip=True) for td in first.find_all(['td','th'])]
-            data_trs = table.find_all('tr')[1:]
-        else:
-            data_trs = table.find_all('tr')
-    else:
-        data_trs = table.find_all('tr')[1:]
+    trs = table.find_all('tr')
+    if not headers and trs:
+        headers = [td.get_text(strip=True) for td in trs[0].find_all(['td','th'], recursive=False)]
+    data_trs = trs[1:] if trs else trs
 
-    headers_norm = [normalize_key(h) for h in headers]
+    # 表头 -> 规范列位置（见 _CANON_INDEX），无法识别的列为 -1
+    col_idx = [_CANON_INDEX.get(normalize_key(h), -1) for h in headers]
+    ncol = len(col_idx)
 
     vuln_rows: List[Dict[str, Any]] = []
     port_pairs: List[Tuple[str,str]] = []
 
     for tr in data_trs:
-        cols = [td.get_text(" ", strip=True) for td in tr.find_all(['td','th'])]
+        # 只取本行直属单元格，嵌套表格的单元格不重复计入
+        cols = [td.get_text(" ", strip=True) for td in tr.find_all(['td','th'], recursive=False)]
         if not cols:
             continue
-        row = {headers_norm[i] if i < len(headers_norm) else f'col{i}': cols[i] for i in range(len(cols))}
+        # 按规范列位置散列到定长列表（同一规范列出现多次时以靠后的为准）
+        vals = [''] * len(_CANON_COLS)
+        present = set()
+        for i, c in enumerate(cols):
+            j = col_idx[i] if i < ncol else -1
+            if j >= 0:
+                vals[j] = c
+                present.add(j)
         # 端口行判定：含 IP+端口 且不含明显“漏洞名称/风险”等
-        has_ip = any(k in row and IP_RE.search(str(row[k])) for k in row)
-        has_port = any(k in row and re.search(r'^\d{1,5}$', str(row[k])) for k in row)
-        has_vuln_keys = any(k in row for k in ('name','risk','desc','fix','cve'))
+        has_ip = any(IP_RE.search(c) for c in cols)
+        has_port = any(_PORT_EXACT_RE.search(c) for c in cols)
+        has_vuln_keys = not present.isdisjoint(_VULN_COL_POS)
 
         if has_ip and has_port and not has_vuln_keys:
             ip = None; port = None
-            for k, v in row.items():
-                if isinstance(v, str) and IP_RE.search(v):
-                    ip = IP_RE.search(v).group(1)
-                if isinstance(v, str) and re.fullmatch(r'\d{1,5}', v):
-                    port = v
+            for c in cols:
+                m = IP_RE.search(c)
+                if m:
+                    ip = m.group(1)
+                if _PORT_ANY_RE.fullmatch(c):
+                    port = c
             if ip and port:
                 port_pairs.append((ip, port))
             continue
 
         # 作为漏洞行处理
-        vr = {'IP':'', '端口':'', '漏洞名称':'', '风险等级':'', '漏洞说明':'', '加固建议':'', 'CVE':''}
-        for k, v in row.items():
-            if v is None:
-                continue
-            key = k
-            txt = _clean_text_list_or_str(v)
-            if key == 'ip' and not vr['IP']:
-                m = IP_RE.search(txt)
-                vr['IP'] = m.group(1) if m else txt
-            elif key == 'port' and not vr['端口']:
-                m = re.search(r'\d{1,5}', txt)
-                vr['端口'] = m.group(0) if m else txt
-            elif key == 'name' and not vr['漏洞名称']:
-                vr['漏洞名称'] = txt
-            elif key == 'risk' and not vr['风险等级']:
-                m = SEV_INLINE_RE.search(txt)
-                vr['风险等级'] = m.group(1) if m else txt
-            elif key == 'desc' and not vr['漏洞说明']:
-                vr['漏洞说明'] = txt
-            elif key == 'fix' and not vr['加固建议']:
-                vr['加固建议'] = txt
-            elif key == 'cve' and not vr['CVE']:
-                m = CVE_RE.search(txt)
-                vr['CVE'] = m.group(1).upper().replace('_','-') if m else txt
-        # 再从整行抓 CVE
-        if not vr['CVE']:
+        ip, port, name, risk, desc, fix, cve = (_clean_text_list_or_str(v) for v in vals)
+        if ip:
+            m = IP_RE.search(ip)
+            ip = m.group(1) if m else ip
+        if port:
+            m = _PORT_ANY_RE.search(port)
+            port = m.group(0) if m else port
+        if risk:
+            m = SEV_INLINE_RE.search(risk)
+            risk = m.group(1) if m else risk
+        if cve:
+            m = CVE_RE.search(cve)
+            cve = m.group(1).upper().replace('_','-') if m else cve
+        else:
+            # 再从整行抓 CVE
             m = CVE_RE.search(" ".join(cols))
             if m:
-                vr['CVE'] = m.group(1).upper().replace('_','-')
+                cve = m.group(1).upper().replace('_','-')
         # 只有存在“漏洞名称/描述/CVE/风险”等之一才算漏洞行
-        if any(vr[k] for k in ('漏洞名称','漏洞说明','CVE','风险等级')):
-            vuln_rows.append(vr)
+        if name or desc or cve or risk:
+            vuln_rows.append({'IP': ip, '端口': port, '漏洞名称': name, '风险等级': risk,
+                              '漏洞说明': desc, '加固建议': fix, 'CVE': cve})
 
     return vuln_rows, port_pairs
 
@@ -315,43 +400,69 @@ def extract_from_blocks(soup) -> Tuple[List[Dict[str, Any]], List[Tuple[str,str]
     """从非表格的文本块里尽力提取漏洞与端口。"""
     vulns: List[Dict[str, Any]] = []
     ports: List[Tuple[str,str]] = []
-    blocks = soup.find_all(['div','section','li','p'])
+    block_tags = ['div','section','li','p']
+    all_blocks = soup.find_all(block_tags)
+    # 同一元素既可能作为块、也可能作为其他块的兄弟节点被取文本，按 id 缓存
+    text_cache: Dict[int, str] = {}
+
+    def _text_of(el) -> str:
+        t = text_cache.get(id(el))
+        if t is None:
+            t = el.get_text(' ', strip=True)
+            text_cache[id(el)] = t
+        return t
+
+    # 一次遍历记录每个块的直接子块（沿父链找最近的块祖先），不再对每个块做 find
+    block_ids = {id(b) for b in all_blocks}
+    child_blocks: Dict[int, List[Any]] = {}
+    for b in all_blocks:
+        for anc in b.parents:
+            if id(anc) in block_ids:
+                child_blocks.setdefault(id(anc), []).append(b)
+                break
+    # 外层容器只包了一个文本完全相同的子块时，结果与子块重复，跳过；
+    # 其余容器保留，跨子块的匹配（如 IP 与端口分在两个 <p> 中）仍能提取到
+    blocks = []
+    for b in all_blocks:
+        kids = child_blocks.get(id(b))
+        if kids and len(kids) == 1 and _text_of(kids[0]) == _text_of(b):
+            continue
+        blocks.append(b)
+
     for b in blocks:
-        text = b.get_text(' ', strip=True)
+        text = _text_of(b)
         if len(text) < 20:
             continue
+        if not any(h in text for h in _BLOCK_HINTS):
+            low = text.lower()
+            if not any(h in low for h in _BLOCK_HINTS_LOWER):
+                continue
+        tokens = _scan_block_tokens(text)
+        ip = tokens.get('ip', '')
+        port = tokens.get('port', '')
+        cve = tokens.get('cve', '')
+        sev = tokens.get('sev', '')
         # 端口对
-        ip_m = IP_RE.search(text)
-        port_m = PORT_RE.search(text)
-        if ip_m and port_m:
-            ports.append((ip_m.group(1), port_m.group(1)))
+        if ip and port:
+            ports.append((ip, port))
         # 漏洞
-        cve_m = CVE_RE.search(text)
-        sev_m = SEV_INLINE_RE.search(text)
-        if cve_m or ('漏洞' in text) or sev_m:
+        if cve or ('漏洞' in text) or sev:
             vr = {'IP':'', '端口':'', '漏洞名称':'', '风险等级':'', '漏洞说明':'', '加固建议':'', 'CVE':''}
-            if ip_m:
-                vr['IP'] = ip_m.group(1)
-            if port_m:
-                vr['端口'] = port_m.group(1)
-            vr['CVE'] = cve_m.group(1).upper().replace('_','-') if cve_m else ''
-            vr['风险等级'] = sev_m.group(1) if sev_m else ''
+            vr['IP'] = ip
+            vr['端口'] = port
+            vr['CVE'] = cve.upper().replace('_','-')
+            vr['风险等级'] = sev
             # 名称/描述/修复建议的启发式
-            label_map = {
-                '漏洞名称': re.compile(r'漏洞名称|名称|问题|title', re.I),
-                '漏洞说明': re.compile(r'漏洞说明|漏洞描述|描述|说明|description', re.I),
-                '加固建议': re.compile(r'加固建议|修复建议|整改建议|解决办法|处理建议|solution|remediation', re.I),
-            }
             for sib in b.next_siblings:
                 if getattr(sib, 'get_text', None):
-                    st = sib.get_text(' ', strip=True)
+                    st = _text_of(sib)
                     if not st:
                         continue
-                    if not vr['漏洞名称'] and label_map['漏洞名称'].search(st):
+                    if not vr['漏洞名称'] and _LABEL_MAP['漏洞名称'].search(st):
                         vr['漏洞名称'] = st
-                    if not vr['漏洞说明'] and label_map['漏洞说明'].search(st):
+                    if not vr['漏洞说明'] and _LABEL_MAP['漏洞说明'].search(st):
                         vr['漏洞说明'] = st
-                    if not vr['加固建议'] and label_map['加固建议'].search(st):
+                    if not vr['加固建议'] and _LABEL_MAP['加固建议'].search(st):
                         vr['加固建议'] = _clean_text_list_or_str(st)
                     if vr['漏洞名称'] and vr['漏洞说明'] and vr['加固建议']:
                         break
@@ -363,38 +474,86 @@ def extract_from_blocks(soup) -> Tuple[List[Dict[str, Any]], List[Tuple[str,str]
             vulns.append(vr)
     return vulns, ports
 
+def _scan_block_tokens(text: str) -> Dict[str, str]:
+    """单次 finditer 扫描文本块，返回每类标记（ip/cve/port/sev）首次出现的值。"""
+    found: Dict[str, str] = {}
+    for m in _BLOCK_TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind not in found:
+            found[kind] = m.group(kind)
+            if len(found) == 4:
+                break
+    return found
+
 def _extract_js_object_by_marker(text: str, marker: str) -> Optional[str]:
-    """Find JS object literal after marker (e.g. window.data). Return substring or None."""
+    """Find JS object literal after marker (e.g. window.data). Return substring or None.
+
+    用 str.find 在 '{' / '}' / '"' 之间跳跃，并跳过字符串字面量（处理转义），
+    字符串中的花括号不再影响配对。
+    """
     idx = text.find(marker)
     if idx == -1:
         return None
     brace_start = text.find('{', idx)
     if brace_start == -1:
         return None
-    i = brace_start
+    find = text.find
     depth = 0
-    while i < len(text):
-        ch = text[i]
-        if ch == '{':
+    i = brace_start
+    # 各类记号的下一个位置（只在已被越过时重新查找）
+    nxt_open = nxt_close = nxt_quote = -2
+    while True:
+        if nxt_open != -1 and nxt_open < i:
+            nxt_open = find('{', i)
+        if nxt_close != -1 and nxt_close < i:
+            nxt_close = find('}', i)
+        if nxt_quote != -1 and nxt_quote < i:
+            nxt_quote = find('"', i)
+        if nxt_close == -1:
+            return None
+        j = nxt_close
+        if nxt_open != -1 and nxt_open < j:
+            j = nxt_open
+        if nxt_quote != -1 and nxt_quote < j:
+            j = nxt_quote
+
+        if j == nxt_quote:
+            # 跳过字符串：找到前面反斜杠个数为偶数的结束引号
+            k = j + 1
+            while True:
+                k = find('"', k)
+                if k == -1:
+                    return None
+                b = k - 1
+                while text[b] == '\\':
+                    b -= 1
+                if (k - 1 - b) % 2 == 0:
+                    break
+                k += 1
+            i = k + 1
+        elif j == nxt_open:
             depth += 1
-        elif ch == '}':
+            i = j + 1
+        else:
             depth -= 1
             if depth == 0:
-                return text[brace_start:i+1]
-        i += 1
-    return None
+                return text[brace_start:j+1]
+            i = j + 1
 
 def _walk_for_lists(obj: Any, keys: Tuple[str, ...]) -> List[Any]:
+    """迭代深度优先遍历，收集键名命中 keys 的值；结果顺序与递归前序遍历一致。"""
     found: List[Any] = []
-    if isinstance(obj, dict):
-        for k, v in obj.items():
-            if k in keys:
-                found.append(v)
-            else:
-                found.extend(_walk_for_lists(v, keys))
-    elif isinstance(obj, list):
-        for it in obj:
-            found.extend(_walk_for_lists(it, keys))
+    ks = frozenset(keys)
+    # 栈元素为 (是否命中, 值)；子节点逆序入栈以保持原有的遍历顺序
+    stack: List[Tuple[bool, Any]] = [(False, obj)]
+    while stack:
+        hit, cur = stack.pop()
+        if hit:
+            found.append(cur)
+        elif isinstance(cur, dict):
+            stack.extend((k in ks, v) for k, v in reversed(cur.items()))
+        elif isinstance(cur, list):
+            stack.extend((False, it) for it in reversed(cur))
     return found
 
 def normalize_risk(raw: Optional[str]) -> str:
@@ -409,7 +568,7 @@ def normalize_risk(raw: Optional[str]) -> str:
         return '低'
     if any(x in s for x in ('info', '信息', 'informational')):
         return '信息'
-    if re.search(r'\b(4|5)\b', s):
+    if _RISK_LEVEL_RE.search(s):
         return '高'
     return raw or ''
 
@@ -442,8 +601,8 @@ def normalize_record(d: Dict[str, Any]) -> Dict[str, Any]:
         if key in ('ip', 'host', 'ipaddress', '地址'):
             out['IP'] = val
         elif key in ('port', '端口'):
-            m = re.search(r'(\d{1,5})', val)
-            out['端口'] = m.group(1) if m else val
+            m = _PORT_ANY_RE.search(val)
+            out['端口'] = m.group(0) if m else val
         elif key in ('name', 'title', '漏洞名称', 'vuln', '漏洞'):
             out['漏洞名称'] = val
         elif key in ('risk', '风险等级', 'severity'):
@@ -473,16 +632,31 @@ def normalize_record(d: Dict[str, Any]) -> Dict[str, Any]:
             out[k] = ''
     return out
 
+def _decode_html(data: bytes) -> str:
+    """按 BOM / 前 4KB 的 <meta charset> 确定编码后一次解码；都没有时先严格 UTF-8，失败再 GBK。"""
+    if data[:3] == codecs.BOM_UTF8:
+        return data[3:].decode('utf-8', errors='ignore')
+    m = _META_CHARSET_RE.search(data, 0, 4096)
+    if m:
+        try:
+            enc = codecs.lookup(m.group(1).decode('ascii')).name
+        except LookupError:
+            enc = None
+        if enc:
+            return data.decode(enc, errors='ignore')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('gbk', errors='ignore')
+
 def parse_html_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Tuple[str,str]]]:
     """
     解析单个 HTML 文件：若嵌入 JSON 则优先解析；否则回退到表格/文本。
     返回 (vuln_records, port_pairs)
     """
-    try:
-        txt = path.read_text(encoding='utf-8', errors='ignore')
-    except Exception:
-        txt = path.read_text(encoding='gbk', errors='ignore')
-    soup = BeautifulSoup(txt, 'lxml') if BeautifulSoup else None
+    # 只读一次磁盘、只解码一次
+    txt = _decode_html(path.read_bytes())
+    # DOM 只在 JSON 解析失败、确实需要时才构建（RSAS 报告通常命中 window.data）
 
     vulns_all: List[Dict[str, Any]] = []
     ports_all: List[Tuple[str,str]] = []
@@ -492,16 +666,18 @@ def parse_html_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Tuple[str,st
     js_text = _extract_js_object_by_marker(txt, "window.data")
     if js_text:
         try:
-            parsed = json.loads(js_text)
+            parsed = _jloads(js_text)
         except Exception:
             try:
-                cleaned = re.sub(r',\s*(?=[}\]])', '', js_text)
-                parsed = json.loads(cleaned)
+                cleaned = _TRAILING_COMMA_RE.sub('', js_text)
+                parsed = _jloads(cleaned)
             except Exception:
                 parsed = None
 
-    if parsed is None and soup is not None:
-        for script in soup.find_all("script"):
+    # 脚本扫描只关心含 "vul" 的脚本；全文都不含时无需为此构建 DOM
+    if parsed is None and BeautifulSoup and _SCRIPT_HINT_RE.search(txt):
+        script_soup = BeautifulSoup(txt, 'lxml', parse_only=_SCRIPT_STRAINER)
+        for script in script_soup.find_all("script"):
             st = script.string or script.get_text() or ""
             if not st:
                 continue
@@ -514,12 +690,12 @@ def parse_html_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Tuple[str,st
                     cand = None
                 if cand:
                     try:
-                        parsed = json.loads(cand)
+                        parsed = _jloads(cand)
                         break
                     except Exception:
                         try:
-                            cand2 = re.sub(r',\s*(?=[}\]])', '', cand)
-                            parsed = json.loads(cand2)
+                            cand2 = _TRAILING_COMMA_RE.sub('', cand)
+                            parsed = _jloads(cand2)
                             break
                         except Exception:
                             parsed = None
@@ -557,7 +733,7 @@ def parse_html_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Tuple[str,st
                         fix_txt = _clean_text_list_or_str(sol) if sol is not None else ''
                         level = subv.get('vul_level') or subv.get('threat_level') or vm.get('vul_level') or vm.get('threat_level','')
                         rec = {
-                            'IP': ip or '',
+                            'IP': _clean_text_list_or_str(ip) if ip else '',
                             '端口': str(port) if port else '',
                             '漏洞名称': _clean_text_list_or_str(name) if name else '',
                             '风险等级': normalize_risk(level),
@@ -595,12 +771,13 @@ def parse_html_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Tuple[str,st
                     vulns_all.append(rec)
                     if ip and port:
                         ports_all.append((ip, str(port)))
-        # 统一归一化
-        return [normalize_record(r) for r in vulns_all], ports_all
+        # JSON 路径的字段已按列名构造，端口/CVE 的规整在合并阶段按列统一完成
+        return vulns_all, ports_all
 
     # 2) 回退到表格/文本解析
-    if soup is None:
+    if BeautifulSoup is None:
         return [], []
+    soup = BeautifulSoup(txt, 'lxml')
 
     for table in soup.find_all('table'):
         try:
@@ -608,71 +785,66 @@ def parse_html_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Tuple[str,st
             vulns_all.extend(vrows)
             ports_all.extend(ppairs)
         except Exception:
-            log(f"表格解析出错: {traceback.format_exc()}")
+            logger.exception("表格解析出错")
 
     try:
         v2, p2 = extract_from_blocks(soup)
         vulns_all.extend(v2)
         ports_all.extend(p2)
     except Exception:
-        log(f"文本块解析出错: {traceback.format_exc()}")
+        logger.exception("文本块解析出错")
 
     return [normalize_record(r) for r in vulns_all], ports_all
 
 # ----------------------------- 合并 & 输出 -----------------------------
 
-def merge_vulns(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    seen = set(); out = []
-    for r in records:
-        key = (r.get('IP','').strip(), r.get('端口','').strip(), r.get('漏洞名称','').strip(), r.get('CVE','').strip())
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(r)
-    for i, r in enumerate(out, start=1):
-        r['序号'] = i
-    for r in out:
-        for k in ['漏洞名称','风险等级','漏洞说明','加固建议','CVE','IP','端口']:
-            if not r.get(k):
-                r[k] = ''
-    return out
-
-def merge_ports(pairs: List[Tuple[str,str]]) -> List[Dict[str, Any]]:
-    seen = set(); out = []
-    for ip, port in pairs:
-        if not ip or not port:
-            continue
-        key = (ip.strip(), port.strip())
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append({'序号': 0, 'IP': key[0], '端口': key[1]})
-    for i, r in enumerate(out, start=1):
-        r['序号'] = i
-    return out
-
-def save_excels(vulns: List[Dict[str, Any]], ports: List[Dict[str, Any]], outdir: Path) -> None:
+# 默认解析进程数上限：controller 会同时运行 RSAS/AWVS/nmap 等脚本，各自按核数开满进程会互相争抢
+MAX_WORKERS = 4
+
+VULN_COLS = ['序号','IP','端口','漏洞名称','风险等级','漏洞说明','加固建议','CVE']
+PORT_COLS = ['序号','IP','端口']
+
+def merge_vulns(records: List[Dict[str, Any]]) -> "pd.DataFrame":
+    """按 (IP, 端口, 漏洞名称, CVE) 去重并重新编号，返回 DataFrame。"""
+    df = pd.DataFrame(records).reindex(columns=VULN_COLS).fillna('').astype(str)
+    # 端口取首个数字串、CVE 规范为大写连字符形式；匹配不到时保留原值
+    df['端口'] = df['端口'].str.extract(r'(\d{1,5})', expand=False).fillna(df['端口'])
+    df['CVE'] = (df['CVE'].str.extract(CVE_RE.pattern, flags=re.I, expand=False)
+                 .str.upper().str.replace('_', '-', regex=False).fillna(df['CVE']))
+    key_cols = ['IP','端口','漏洞名称','CVE']
+    df[key_cols] = df[key_cols].apply(lambda col: col.str.strip())
+    df = df.drop_duplicates(subset=key_cols, keep='first').reset_index(drop=True)
+    df['序号'] = range(1, len(df) + 1)
+    return df
+
+def merge_ports(pairs: List[Tuple[str,str]]) -> "pd.DataFrame":
+    """按 (IP, 端口) 去重并重新编号，返回 DataFrame。"""
+    df = pd.DataFrame(pairs, columns=['IP','端口'])
+    df = df[(df['IP'].fillna('') != '') & (df['端口'].fillna('') != '')]
+    df = df.astype(str).apply(lambda col: col.str.strip())
+    df = df.drop_duplicates(keep='first').reset_index(drop=True)
+    df.insert(0, '序号', range(1, len(df) + 1))
+    return df
+
+def _write_xlsx(path: Path, columns: List[str], rows) -> None:
+    """以 openpyxl write-only 模式逐行流式写出（每次都新建文件，覆盖旧文件）。"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+def save_excels(vulns: "pd.DataFrame", ports: "pd.DataFrame", outdir: Path) -> None:
     ensure_env()
     outdir.mkdir(parents=True, exist_ok=True)
     # 漏洞报告
-    df_v = pd.DataFrame(vulns)
-    cols_v = ['序号','IP','端口','漏洞名称','风险等级','漏洞说明','加固建议','CVE']
-    for c in cols_v:
-        if c not in df_v.columns:
-            df_v[c] = ''
-    df_v = df_v[cols_v]
-    (outdir / '漏洞报告.xlsx').unlink(missing_ok=True)
-    df_v.to_excel(outdir / '漏洞报告.xlsx', index=False)
+    df_v = vulns.reindex(columns=VULN_COLS, fill_value='')
+    _write_xlsx(outdir / '漏洞报告.xlsx', VULN_COLS, df_v.itertuples(index=False, name=None))
 
     # 开放端口
-    df_p = pd.DataFrame(ports)
-    cols_p = ['序号','IP','端口']
-    for c in cols_p:
-        if c not in df_p.columns:
-            df_p[c] = ''
-    df_p = df_p[cols_p]
-    (outdir / '开放端口.xlsx').unlink(missing_ok=True)
-    df_p.to_excel(outdir / '开放端口.xlsx', index=False)
+    df_p = ports.reindex(columns=PORT_COLS, fill_value='')
+    _write_xlsx(outdir / '开放端口.xlsx', PORT_COLS, df_p.itertuples(index=False, name=None))
 
     log(f"已输出：{outdir / '漏洞报告.xlsx'}  和  {outdir / '开放端口.xlsx'}")
 
@@ -693,7 +865,17 @@ def use_existing_outputs_if_present(base: Path, outdir: Path) -> bool:
                 log(f"复制现成文件失败 {src}: {e}")
     return ok
 
-def process_folder(base: Path, output_folder: Path, force_regenerate: bool=True) -> None:
+def _parse_html_file_safe(path: Path) -> Tuple[Path, List[Dict[str, Any]], List[Tuple[str,str]], Optional[str]]:
+    """进程池任务：解析单个文件，异常转为错误文本返回，避免中断其它文件。"""
+    try:
+        v, p = parse_html_file(path)
+        return path, v, p, None
+    except Exception as e:
+        # 完整堆栈只在 DEBUG 级别输出，返回给主进程的只是简短错误信息
+        logger.debug("解析 %s 出错", path, exc_info=True)
+        return path, [], [], f"{type(e).__name__}: {e}"
+
+def process_folder(base: Path, output_folder: Path, force_regenerate: bool=True, jobs: Optional[int]=None) -> None:
     ensure_env()
 
     files = [p for p in base.iterdir() if p.is_file()]
@@ -716,18 +898,28 @@ def process_folder(base: Path, output_folder: Path, force_regenerate: bool=True)
             html_files += find_files(t, ('.html', '.htm'))
         log(f"发现 HTML 报告: {len(html_files)} 个")
 
-        # 实时进度条遍历 HTML 文件
+        # 实时进度条遍历 HTML 文件；各文件互相独立，多文件时用进程池并行解析
         all_vulns: List[Dict[str, Any]] = []
         all_ports_pairs: List[Tuple[str,str]] = []
-        for hp in tqdm(html_files, desc='解析 HTML', unit='file'):
-            try:
-                v, p = parse_html_file(hp)
+        jobs = jobs or min(os.cpu_count() or 1, MAX_WORKERS)
+        if jobs > 1 and len(html_files) > 1:
+            executor = ProcessPoolExecutor(max_workers=min(jobs, len(html_files)))
+            results = executor.map(_parse_html_file_safe, html_files, chunksize=4)
+        else:
+            executor = None
+            results = map(_parse_html_file_safe, html_files)
+        try:
+            for hp, v, p, err in tqdm(results, total=len(html_files), desc='解析 HTML', unit='file'):
+                if err:
+                    log(f"解析 {hp} 出错: {err}")
+                    continue
                 if v:
                     all_vulns.extend(v)
                 if p:
                     all_ports_pairs.extend(p)
-            except Exception as e:
-                log(f"解析 {hp} 出错: {e}\n{traceback.format_exc()}")
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         # 合并与导出
         merged_vulns = merge_vulns(all_vulns)
@@ -752,6 +944,8 @@ def main():
                         help='强制使用 ASCII 框（不使用 Unicode 盒绘字符）')
     parser.add_argument('--margin', type=int, default=0, help='横幅左侧外边距空格数（默认 0）')
     parser.add_argument('--pad', type=int, default=1, help='横幅内部左右边距（默认 1）')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help=f'并行解析 HTML 的进程数（默认 CPU 核数，最多 {MAX_WORKERS}；1 为串行）')
     args = parser.parse_args()
 
     # 打印横幅
@@ -762,10 +956,12 @@ def main():
     outdir = Path(args.output).resolve()
     log(f"输入目录: {base}，输出目录: {outdir}，force_regenerate={args.force}")
     try:
-        process_folder(base, outdir, force_regenerate=args.force)
-    except Exception as e:
-        log(f"主流程异常: {e}\n{traceback.format_exc()}")
+        process_folder(base, outdir, force_regenerate=args.force, jobs=args.jobs)
+    except Exception:
+        logger.exception("主流程异常")
         sys.exit(2)
 
 if __name__ == '__main__':
+    # 打包为 exe 后子进程会重新执行入口，需先交给 freeze_support 处理
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
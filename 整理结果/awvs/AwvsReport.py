@@ -10,10 +10,20 @@ import sys
 import os
 import unicodedata
 import textwrap
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # 日志配置
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+# HTML 解析器：优先使用 lxml（C 实现，大报告快很多），未安装时退回内置 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
 # 颜色定义
 ANSI = {
     'reset': "\033[0m",
@@ -24,6 +34,11 @@ ANSI = {
     'yellow': "\033[33m",
 }
 
+# 输入文件数达到该值才启用多进程解析（文件少时进程启动开销得不偿失）
+PARALLEL_MIN_FILES = 4
+# 解析进程数上限：controller 会同时运行 RSAS/AWVS/nmap 等脚本，各自按核数开满进程会互相争抢
+MAX_WORKERS = 4
+
 AUTHOR = 'zhkali'
 REPOS = [
     'https://github.com/ouwenjin/awvs-report-extractor',
@@ -47,24 +62,19 @@ def strip_ansi(s: str) -> str:
     """去掉 ANSI 控制码，用于准确计算可见长度"""
     return _ansi_re.sub('', s)
 
+@functools.lru_cache(maxsize=256)
 def visible_width(s: str) -> int:
     """
     计算字符串在终端中的可见列宽（考虑中文等宽字符为 2 列、组合字符为 0 列）。
     传入字符串可以包含 ANSI 码，函数会先移除 ANSI 码再计算。
     """
     s2 = strip_ansi(s)
-    w = 0
-    for ch in s2:
-        # 跳过不可见的组合字符（比如重音组合符）
-        if unicodedata.combining(ch):
-            continue
-        ea = unicodedata.east_asian_width(ch)
-        # 'F' (Fullwidth), 'W' (Wide) 视作 2 列；其余视作 1 列
-        if ea in ('F', 'W'):
-            w += 2
-        else:
-            w += 1
-    return w
+    # 纯 ASCII（横幅中的链接等）每个字符都占 1 列
+    if s2.isascii():
+        return len(s2)
+    # 组合字符为 0 列；'F' (Fullwidth)、'W' (Wide) 视作 2 列；其余视作 1 列
+    return sum(0 if unicodedata.combining(ch) else 2 if unicodedata.east_asian_width(ch) in ('F', 'W') else 1
+               for ch in s2)
 
 def pad_visible(s: str, target_visible_len: int) -> str:
     """
@@ -121,40 +131,36 @@ def print_banner(use_unicode: bool = True, outer_margin: int = 0, inner_pad: int
             else:
                 colored.append((c_bold + c_cyan + ln + c_reset) if _COLOR else ln)
 
-    # 计算可见最大宽度（使用 visible_width 来正确处理中文宽度）
-    content_max = max((visible_width(x) for x in colored), default=0)
+    # 计算可见宽度（使用 visible_width 来正确处理中文宽度），每行只算一次
+    widths = [visible_width(x) for x in colored]
+    content_max = max(widths, default=0)
 
     # 预先把每行（带颜色的）右侧填充到 content_max（保证每行实际可见宽度相同）
-    padded_lines = [pad_visible(ln, content_max) for ln in colored]
+    padded_lines = [ln + ' ' * (content_max - w) for ln, w in zip(colored, widths)]
 
     # line_content = inner_pad + padded_line + inner_pad
     total_inner = inner_pad * 2 + content_max
     width = total_inner + 2  # 两侧竖线占 2
 
-    # 构造顶部与底部边框
+    # 构造顶部与底部边框（统一颜色）
     top = tl + (hor * (width - 2)) + tr
     bottom = bl + (hor * (width - 2)) + br
+    if _COLOR and use_unicode:
+        top = c_cyan + top + c_reset
+        bottom = c_cyan + bottom + c_reset
 
     pad = ' ' * max(0, outer_margin)
 
-    # 打印顶部（统一颜色）
-    if _COLOR and use_unicode:
-        print(pad + (c_cyan + top + c_reset))
-    else:
-        print(pad + top)
-
-    # 打印所有内容行（左对齐：艺术字本身的前导空格会保留）
+    # 所有内容行左对齐（艺术字本身的前导空格会保留）
     left_bar = (c_cyan + ver + c_reset) if _COLOR else ver
     right_bar = (c_cyan + ver + c_reset) if _COLOR else ver
-    for pl in padded_lines:
-        line_content = (' ' * inner_pad) + pl + (' ' * inner_pad)
-        print(pad + left_bar + line_content + right_bar)
+    side = ' ' * inner_pad
+    out_lines = [pad + top]
+    out_lines += [pad + left_bar + side + pl + side + right_bar for pl in padded_lines]
+    out_lines.append(pad + bottom)
 
-    # 打印底部
-    if _COLOR and use_unicode:
-        print(pad + (c_cyan + bottom + c_reset))
-    else:
-        print(pad + bottom)
+    # 整个横幅拼成一个字符串一次写出
+    sys.stdout.write('\n'.join(out_lines) + '\n')
 
 # 输出列（与 AwvsReport.xlsx 保持一致）
 COLS = ['风险目标','风险名称','风险地址','风险等级','风险描述','风险详细','风险请求','整改意见']
@@ -178,24 +184,40 @@ TARGET_PATTERNS = [
     r'Scan target[:：]?\s*(.+)',
 ]
 
+# 预编译正则（逐表、逐行调用，避免每次重复解析模式）
+_TARGET_RES = [re.compile(p, re.IGNORECASE) for p in TARGET_PATTERNS]
+# 所有目标模式合成一条交替正则：绝大多数标签都不命中，一次扫描即可跳过
+_TARGET_ANY_RE = re.compile('|'.join(f'(?:{p})' for p in TARGET_PATTERNS), re.IGNORECASE)
+_START_URL_RE = re.compile(r'(Start url|开始 url|开始URL|开始 URL|Start URL)', re.IGNORECASE)
+_REQUEST_LINE_RE = re.compile(r'^(GET|POST|PUT|DELETE|HEAD)\s+', re.MULTILINE)
+_AFFECTED_KW_RE = re.compile('|'.join(map(re.escape, [
+    'alert group','severity','description','recommend','details','警报','严重性','描述','建议','详情','修复建议','漏洞描述','漏洞'])))
+_FIELD_LABEL_RE = re.compile(r'(alert|severity|description|details|recommend|警报|严重|描述|详情|建议)', re.IGNORECASE)
+
+@functools.lru_cache(maxsize=4096)
 def normalize_key(s: str) -> str:
-    if not s:
-        return ""
-    s2 = s.strip()
-    s2 = re.sub(r'[\r\n\t]+', ' ', s2)
-    s2 = re.sub(r'\s+', ' ', s2)
-    return s2.lower()
+    # str.split() 无参时按任意空白切分并丢弃空串，等价于 strip + 折叠空白，全程在 C 层完成
+    return ' '.join(s.split()).lower() if s else ""
+
+# 逐行按此顺序尝试把表头映射到输出列
+MATCH_ORDER = ('风险名称','风险等级','风险描述','整改意见','风险详细','风险请求','风险地址')
+
+# 每列一个组合正则（判断“候选词 ⊂ 表头”）+ 一个拼接串（判断“表头 ⊂ 候选词”），导入时构建一次
+_KW_RES = {col: re.compile('|'.join(re.escape(normalize_key(c)) for c in cands))
+           for col, cands in KEYWORD_MAP.items()}
+_KW_JOINED = {col: '\x00'.join(normalize_key(c) for c in cands) for col, cands in KEYWORD_MAP.items()}
+
+def key_norm_matches_column(key_norm: str, column: str) -> bool:
+    """key_norm 须已经过 normalize_key；逐行匹配多列时只需归一化一次"""
+    if column not in _KW_RES:
+        return False
+    # 表头不含 \x00，不会跨越拼接串中的分隔符
+    return bool(_KW_RES[column].search(key_norm)) or key_norm in _KW_JOINED[column]
 
 def key_matches_column(key_text: str, column: str) -> bool:
     if not key_text:
         return False
-    key_norm = normalize_key(key_text)
-    candidates = KEYWORD_MAP.get(column, [])
-    for cand in candidates:
-        cand_norm = normalize_key(cand)
-        if cand_norm in key_norm or key_norm in cand_norm:
-            return True
-    return False
+    return key_norm_matches_column(normalize_key(key_text), column)
 
 def extract_text(node):
     if node is None:
@@ -210,20 +232,23 @@ def extract_request_from_node(node):
         if found:
             return found.get_text("\n", strip=True)
     txt = extract_text(node)
-    if re.search(r'^(GET|POST|PUT|DELETE|HEAD)\s+', txt, flags=re.MULTILINE):
+    if _REQUEST_LINE_RE.search(txt):
         return txt
     return ""
 
 def find_target_from_document(soup: BeautifulSoup) -> str:
     for header_tag in soup.find_all(['h1','h2','h3','div','p','span','td']):
         txt = header_tag.get_text(" ", strip=True)
-        for pat in TARGET_PATTERNS:
-            m = re.search(pat, txt, flags=re.IGNORECASE)
+        if not _TARGET_ANY_RE.search(txt):
+            continue
+        # 命中后仍按 TARGET_PATTERNS 的先后顺序取值，保持原有优先级
+        for pat in _TARGET_RES:
+            m = pat.search(txt)
             if m:
                 if m.groups():
                     return m.group(1).strip()
                 return txt.strip()
-    maybe = soup.find(lambda el: el.name in ('td','th','div','span') and re.search(r'(Start url|开始 url|开始URL|开始 URL|Start URL)', el.get_text(), flags=re.IGNORECASE))
+    maybe = soup.find(lambda el: el.name in ('td','th','div','span') and _START_URL_RE.search(el.get_text()))
     if maybe:
         sib = maybe.find_next_sibling()
         if sib:
@@ -231,17 +256,18 @@ def find_target_from_document(soup: BeautifulSoup) -> str:
     return ""
 
 def is_affected_table(table_tag: BeautifulSoup) -> bool:
-    txt = table_tag.get_text(" ", strip=True).lower()
-    keywords = ['alert group','severity','description','recommend','details','警报','严重性','描述','建议','详情','修复建议','漏洞描述','漏洞']
-    score = 0
-    for kw in keywords:
-        if kw in txt:
-            score += 1
-    return score >= 1
+    # 命中任一关键词即可判定：逐个文本节点惰性搜索，首次命中立即返回，不再拼接整表文本
+    for text in table_tag.strings:
+        if _AFFECTED_KW_RE.search(text.lower()):
+            return True
+    return False
 
 def parse_single_html(path: Path) -> List[Dict]:
-    html = path.read_text(encoding='utf-8', errors='ignore')
-    soup = BeautifulSoup(html, "html.parser")
+    # 直接交给 BS4/lxml 解码原始字节，省去一次 Python 侧逐字符的 errors='ignore' 解码；
+    # 报告均为 UTF-8，给出提示可避免编码探测（解码失败时 BS4 会自动回退）
+    data = path.read_bytes()
+    soup = BeautifulSoup(data, HTML_PARSER, from_encoding='utf-8')
+    del data  # 树建好后原始字节不再需要，避免与整棵树同时常驻内存
     rows = []
     current_target = find_target_from_document(soup)
 
@@ -255,11 +281,13 @@ def parse_single_html(path: Path) -> List[Dict]:
         first_td = table.find('td')
         if first_td:
             t0 = extract_text(first_td)
-            if len(t0) < 60 and not re.search(r'(alert|severity|description|details|recommend|警报|严重|描述|详情|建议)', t0, flags=re.IGNORECASE):
+            if len(t0) < 60 and not _FIELD_LABEL_RE.search(t0):
                 item['风险地址'] = t0
 
-        for tr in table.find_all('tr'):
-            cells = tr.find_all(['th','td'])
+        # 惰性遍历行，不先物化整表的 tr 列表；单元格只取 tr 的直接子节点，
+        # 既跳过空白文本节点，也不会把嵌套表格里的 td 误当作本行的键/值
+        for tr in (el for el in table.descendants if el.name == 'tr'):
+            cells = [c for c in tr.children if c.name in ('th', 'td')]
             if not cells:
                 continue
             if len(cells) == 1:
@@ -268,10 +296,11 @@ def parse_single_html(path: Path) -> List[Dict]:
             val_cell = cells[1] if len(cells) > 1 else None
             key_text = extract_text(key_cell)
             val_text = extract_text(val_cell) if val_cell else ""
+            key_low = normalize_key(key_text)
 
             mapped = False
-            for col in ['风险名称','风险等级','风险描述','整改意见','风险详细','风险请求','风险地址']:
-                if key_matches_column(key_text, col):
+            for col in MATCH_ORDER if key_text else ():
+                if key_norm_matches_column(key_low, col):
                     if col == '风险请求':
                         req = extract_request_from_node(val_cell)
                         item[col] = req or val_text
@@ -282,11 +311,10 @@ def parse_single_html(path: Path) -> List[Dict]:
             if mapped:
                 continue
 
-            if re.search(r'^(GET|POST|PUT|DELETE|HEAD)\s+', val_text, flags=re.MULTILINE):
+            if _REQUEST_LINE_RE.search(val_text):
                 item['风险请求'] = val_text
                 continue
 
-            key_low = normalize_key(key_text)
             if 'severity' in key_low or '严重' in key_low:
                 item['风险等级'] = val_text
             elif 'alert' in key_low or '警报' in key_low or '漏洞' in key_low:
@@ -315,15 +343,26 @@ def parse_single_html(path: Path) -> List[Dict]:
 
         rows.append(item)
 
+    # BS4 树内部父子/兄弟互相引用，显式拆除以便逐文件及时释放内存，不必等循环垃圾回收
+    soup.decompose()
     return rows
 
 def parse_files(input_paths: List[Path]) -> pd.DataFrame:
     all_rows = []
-    for p in input_paths:
-        logging.info(f"解析文件: {p.name}")
-        parsed = parse_single_html(p)
-        logging.info(f"  在 {p.name} 中找到 {len(parsed)} 个受影响项")
-        all_rows.extend(parsed)
+    if len(input_paths) >= PARALLEL_MIN_FILES and (os.cpu_count() or 1) > 1:
+        # 各文件解析互相独立且为 CPU 密集型，用进程池绕开 GIL；map 保持输入顺序
+        with ProcessPoolExecutor(max_workers=min(len(input_paths), os.cpu_count() or 1, MAX_WORKERS)) as ex:
+            results = zip(input_paths, ex.map(parse_single_html, input_paths))
+            for p, parsed in results:
+                logging.info(f"解析文件: {p.name}")
+                logging.info(f"  在 {p.name} 中找到 {len(parsed)} 个受影响项")
+                all_rows.extend(parsed)
+    else:
+        for p in input_paths:
+            logging.info(f"解析文件: {p.name}")
+            parsed = parse_single_html(p)
+            logging.info(f"  在 {p.name} 中找到 {len(parsed)} 个受影响项")
+            all_rows.extend(parsed)
     if not all_rows:
         logging.warning("未解析到任何受影响项。请检查输入是否为 Acunetix/AWVS Affected Items 报告。")
     df = pd.DataFrame(all_rows, columns=COLS)
@@ -377,4 +416,6 @@ def main():
     logging.info(f"已保存 {len(df)} 行到 {out_path.resolve()}")
 
 if __name__ == "__main__":
+    # 打包为 exe 后子进程会重新执行入口，需先交给 freeze_support 处理
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -43,7 +43,8 @@ def write_with_note(df, out_path: Path, note_text: str, note_col: str = None):
         note_col = note_col or cols[0]
         row = {c: "" for c in cols}
         row[note_col] = note_text
-        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+        # 空表只需写一行提示，直接构造单行 DataFrame，无需 concat
+        df = pd.DataFrame([row], columns=cols)
     df.to_excel(out_path, index=False, engine="openpyxl")
 
 # 主流程
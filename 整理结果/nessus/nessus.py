@@ -3,29 +3,34 @@ import os
 import datetime
 import shutil
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 
 # ---------- 配置 ----------
 REFERENCE_FILE = 'Nessus中文报告.xlsx'  # 漏洞引用表
 RISK_MAPPING = {'Critical': '紧急', 'High': '高', 'Medium': '中', 'Low': '低', 'None': '无'}
 
+# 表格样式（模块级常量，各单元格共用同一对象，不再逐格新建 Font()）
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                     top=Side(style='thin'), bottom=Side(style='thin'))
+LEFT_TOP_ALIGN = Alignment(horizontal='left', vertical='top', wrap_text=True)
+CENTER_ALIGN = Alignment(horizontal='center', vertical='center', wrap_text=True)
+BOLD_FONT = Font(bold=True)
+PLAIN_FONT = Font()
+
 # ---------- CSV处理 ----------
 def merge_csv_files():
     csv_files = [f for f in os.listdir(os.getcwd()) if f.endswith('.csv')]
     if not csv_files:
         print("当前目录没有 CSV 文件")
-        return pd.DataFrame(), None
-    elif len(csv_files) == 1:
-        df = pd.read_csv(csv_files[0])
-        merged_file = csv_files[0]
-    else:
-        df_list = [pd.read_csv(f) for f in csv_files]
-        df = pd.concat(df_list, ignore_index=True)
-        merged_file = 'merged.csv'
-        df.to_csv(merged_file, index=False, encoding='utf-8-sig')
-        print(f"已合并 {len(csv_files)} 个 CSV 文件为 {merged_file}")
-    return df, merged_file
+        return pd.DataFrame()
+    # Nessus 导出列均按文本读取：跳过逐文件的类型推断与缺失值识别，空单元格保持为 ''
+    df_list = [pd.read_csv(f, dtype=str, na_filter=False) for f in csv_files]
+    df = df_list[0] if len(df_list) == 1 else pd.concat(df_list, ignore_index=True)
+    if len(csv_files) > 1:
+        print(f"已合并 {len(csv_files)} 个 CSV 文件")
+    return df
 
 def convert_csv_to_xlsx(csv_file):
     xlsx_file = os.path.splitext(csv_file)[0] + '.xlsx'
@@ -54,64 +59,96 @@ def load_reference_vuln_table(ref_file, sheet_name='漏洞引用表'):
         return {}, pd.DataFrame()
 
 # ---------- 输入数据 ----------
+def prepare_input_data(df_input):
+    # CSV 按文本读入，空的 Risk 与原先的缺失值一样视为 'None'
+    df_input = df_input.replace({'Risk': {'': 'None'}})
+    # 与原先 CSV→xlsx→读回 的类型一致：非空值全部能解析为数字的列还原为数值（空单元格为缺失值），
+    # 输出 Excel 时不作为文本存储
+    for col in df_input.columns:
+        if df_input[col].dtype.kind in 'biufc':
+            continue
+        nonempty = df_input[col] != ''
+        num = pd.to_numeric(df_input[col].where(nonempty), errors='coerce')
+        if num[nonempty].notna().all():
+            df_input[col] = num
+    df_input = df_input.fillna({'CVE':'','Plugin Output':'','Port':'','Synopsis':'',
+                                'Description':'','Solution':'','Name':'','Risk':'None'})
+    df_vulns = df_input[df_input['Risk'] != 'None'].copy()
+    return df_vulns, df_input['Host'].unique()
+
 def load_input_data(input_file):
     try:
         xls = pd.ExcelFile(input_file)
         sheet_name = xls.sheet_names[0]
         df_input = pd.read_excel(input_file, sheet_name=sheet_name, header=0)
-        df_input.fillna({'CVE':'','Plugin Output':'','Port':'','Synopsis':'',
-                         'Description':'','Solution':'','Name':'','Risk':'None'}, inplace=True)
-        df_vulns = df_input[df_input['Risk'] != 'None'].copy()
-        return df_vulns, df_input['Host'].unique()
+        return prepare_input_data(df_input)
     except Exception as e:
         print(f"输入数据加载失败: {e}")
         return pd.DataFrame(), []
 
 # ---------- 扫描结果 ----------
 def generate_scan_results(df_vulns, vuln_ref_dict):
-    results=[]
-    for idx,row in df_vulns.iterrows():
-        plugin_id=str(row['Plugin ID'])
-        ref=vuln_ref_dict.get(plugin_id,{})
-        vuln_name=ref.get('中文名称',row['Name'])
-        risk_level=ref.get('风险等级',RISK_MAPPING.get(row['Risk'],'未知'))
-        description=ref.get('漏洞说明',row['Synopsis']+'\n'+row['Description'])
-        solution=ref.get('加固建议',row['Solution'])
-        results.append([row['Host'],row['Port'],vuln_name,risk_level,
-                        description,solution,row['CVE'],row['Plugin Output']])
-    df_results=pd.DataFrame(results,columns=['IP','端口','漏洞名称','风险等级',
-                                             '漏洞说明','加固建议','CVE','扫描返回信息'])
+    # 按 Plugin ID 对齐引用表；命中引用表的行取引用值（即使引用值为空），否则取 Nessus 原始值
+    plugin_ids=df_vulns['Plugin ID'].astype(str)
+    ref_cols=['中文名称','风险等级','漏洞说明','加固建议']
+    df_ref=pd.DataFrame.from_dict(vuln_ref_dict,orient='index').reindex(columns=ref_cols)
+    hit=plugin_ids.isin(df_ref.index)
+    ref=df_ref.reindex(plugin_ids.values).set_axis(df_vulns.index)
+    df_results=pd.DataFrame({
+        'IP':df_vulns['Host'],
+        '端口':df_vulns['Port'],
+        '漏洞名称':ref['中文名称'].where(hit,df_vulns['Name']),
+        '风险等级':ref['风险等级'].where(hit,df_vulns['Risk'].map(RISK_MAPPING).fillna('未知')),
+        '漏洞说明':ref['漏洞说明'].where(hit,df_vulns['Synopsis']+'\n'+df_vulns['Description']),
+        '加固建议':ref['加固建议'].where(hit,df_vulns['Solution']),
+        'CVE':df_vulns['CVE'],
+        '扫描返回信息':df_vulns['Plugin Output'],
+    }).reset_index(drop=True)
     # 重新生成序号列
     df_results.insert(0, '序号', range(1, len(df_results)+1))
     return df_results
 
 # ---------- 写Excel美化 ----------
-def write_scan_results_only(output_file, results_df):
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                         top=Side(style='thin'), bottom=Side(style='thin'))
-    left_top_align = Alignment(horizontal='left', vertical='top', wrap_text=True)
-    bold_font = Font(bold=True)
+def write_styled_sheet(wb, sheet_name, df, align, col_widths=()):
+    # write-only 工作簿逐行流式写出：表头加粗，所有单元格统一对齐方式与细边框
+    ws = wb.create_sheet(sheet_name)
+    # 列宽必须在写入数据行之前设置
+    for i,w in enumerate(col_widths,start=1):
+        ws.column_dimensions[get_column_letter(i)].width=w
+    # 样式注册为 NamedStyle（按对齐方式区分），单元格只引用样式名
+    header_style=f"header_{align.horizontal}"
+    body_style=f"body_{align.horizontal}"
+    if header_style not in wb.named_styles:
+        wb.add_named_style(NamedStyle(name=header_style, font=BOLD_FONT, alignment=align, border=THIN_BORDER))
+        wb.add_named_style(NamedStyle(name=body_style, font=PLAIN_FONT, alignment=align, border=THIN_BORDER))
+    def styled(values, style):
+        cells=[]
+        for v in values:
+            cell=WriteOnlyCell(ws, value=v)
+            cell.style=style
+            cells.append(cell)
+        return cells
+    ws.append(styled(df.columns, header_style))
+    values=df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        ws.append(styled(row, body_style))
 
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        results_df.to_excel(writer, sheet_name='扫描结果', index=False)
-        ws = writer.sheets['扫描结果']
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-            for cell in row:
-                cell.font = bold_font if cell.row==1 else Font()
-                cell.alignment = left_top_align
-                cell.border = thin_border
-        col_widths_results=[10,20,10,30,10,50,50,20,50]
-        for i,w in enumerate(col_widths_results,start=1):
-            ws.column_dimensions[get_column_letter(i)].width=w
+def write_scan_results_only(output_file, results_df):
+    wb = Workbook(write_only=True)
+    write_styled_sheet(wb, '扫描结果', results_df, LEFT_TOP_ALIGN,
+                       col_widths=[10,20,10,30,10,50,50,20,50])
+    wb.save(output_file)
     print(f"扫描结果生成完成：{output_file}")
 
 # ---------- IP列表 ----------
 def export_ip_list(unique_ips, df_vulns):
     ip_file='ip.xlsx'
     df_ips=pd.DataFrame(unique_ips,columns=['IP'])
-    df_stats=df_vulns.groupby('Risk').size().reindex(['Critical','High','Medium'],fill_value=0).reset_index()
-    df_stats.columns=['风险等级','数量']
-    df_stats['风险等级']=df_stats['风险等级'].map(RISK_MAPPING)
+    # 单列计数用 value_counts 即可，固定按 紧急/高/中 顺序输出
+    counts=df_vulns['Risk'].value_counts()
+    levels=('Critical','High','Medium')
+    df_stats=pd.DataFrame({'风险等级':[RISK_MAPPING[k] for k in levels],
+                           '数量':[int(counts.get(k,0)) for k in levels]})
     with pd.ExcelWriter(ip_file, engine='openpyxl') as writer:
         df_ips.to_excel(writer, sheet_name='IP列表', index=False)
         df_stats.to_excel(writer, sheet_name='漏洞统计', index=False)
@@ -126,36 +163,23 @@ def export_missing_reference_examples(df_vulns,vuln_ref_dict,output_file='缺失
     df_missing=df_vulns[missing_mask].copy()
     df_sheet1=df_missing[['Plugin ID','Name','Host','Port','Risk']]
     df_sheet2=df_missing.copy()
-    thin_border=Border(left=Side(style='thin'), right=Side(style='thin'), 
-                       top=Side(style='thin'), bottom=Side(style='thin'))
-    center_align=Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left_top_align=Alignment(horizontal='left', vertical='top', wrap_text=True)
-    bold_font=Font(bold=True)
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        df_sheet1.to_excel(writer, sheet_name='缺失引用简要', index=False)
-        ws=writer.sheets['缺失引用简要']
-        for row in ws.iter_rows(min_row=1,max_row=ws.max_row,min_col=1,max_col=ws.max_column):
-            for cell in row:
-                cell.font=bold_font if cell.row==1 else Font()
-                cell.alignment=center_align
-                cell.border=thin_border
-        df_sheet2.to_excel(writer, sheet_name='缺失引用样例', index=False)
-        ws=writer.sheets['缺失引用样例']
-        for row in ws.iter_rows(min_row=1,max_row=ws.max_row,min_col=1,max_col=ws.max_column):
-            for cell in row:
-                cell.font=bold_font if cell.row==1 else Font()
-                cell.alignment=left_top_align
-                cell.border=thin_border
+    wb=Workbook(write_only=True)
+    write_styled_sheet(wb, '缺失引用简要', df_sheet1, CENTER_ALIGN)
+    write_styled_sheet(wb, '缺失引用样例', df_sheet2, LEFT_TOP_ALIGN)
+    wb.save(output_file)
     print(f"缺失引用示例已输出：{output_file}, 共 {len(df_missing)} 条记录。")
 
 # ---------- 主流程 ----------
 def main():
-    df_merged, merged_file=merge_csv_files()
+    # 合并后的数据直接在内存中使用，不再落地 merged.csv / .xlsx 再读回
+    df_merged=merge_csv_files()
     if df_merged.empty: return
-    xlsx_file=convert_csv_to_xlsx(merged_file)
     vuln_ref_dict, ref_df=load_reference_vuln_table(REFERENCE_FILE)
-    if df_merged.empty: return
-    df_vulns, unique_ips=load_input_data(xlsx_file)
+    try:
+        df_vulns, unique_ips=prepare_input_data(df_merged)
+    except Exception as e:
+        print(f"输入数据加载失败: {e}")
+        return
     if df_vulns.empty:
         print("没有漏洞数据，结束。")
         return
@@ -167,7 +191,7 @@ def main():
     export_missing_reference_examples(df_vulns, vuln_ref_dict)
 
     # ---------- 新增：复制到上级目录/整理结果 并改名，只保留中高危 ----------
-    high_risk_df = results_df[results_df['风险等级'].isin(['紧急','高''中'])]
+    high_risk_df = results_df[results_df['风险等级'].isin(['紧急','高','中'])]
     target_dir = os.path.join(os.path.dirname(os.getcwd()), "整理结果")
     os.makedirs(target_dir, exist_ok=True)
     target_file = os.path.join(target_dir, "中高危漏洞.xlsx")
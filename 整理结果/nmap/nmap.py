@@ -1,13 +1,35 @@
 import os
 import re
+import functools
+import ipaddress
 import shutil
+import sys
+import numpy as np
 import pandas as pd
-import xml.etree.ElementTree as ET
-from openpyxl import load_workbook
-from openpyxl.styles import Font
+from xml.sax.saxutils import quoteattr
+try:
+    from lxml import etree as ET  # libxml2 解析，大文件更快
+except ImportError:
+    import xml.etree.ElementTree as ET
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle
 from tqdm import tqdm
 import logging
 
+# 读取 xlsx 的引擎：装了 python-calamine（Rust 实现）时优先使用，否则 openpyxl（pandas 默认已是只读模式）
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# 大结果集的写出：装了 xlsxwriter 时以 constant_memory 模式逐行落盘（字符串转义在 C 层完成）
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
 # ===========================
 # 日志配置
 # ===========================
@@ -25,54 +47,106 @@ logger = logging.getLogger(__name__)
 # ===========================
 # 危险端口和服务定义
 # ===========================
-dangerous_ports = {
+dangerous_ports = frozenset({
     20,21,23,25,53,69,111,110,2049,143,137,135,139,389,445,161,
     512,513,514,873,1433,1521,1529,3306,3389,5000,5432,
     5900,5901,5902,6379,7001,888,9200,9300,11211,27017,27018
-}
-dangerous_services = {
+})
+dangerous_services = frozenset({
     'ftp','telnet','smtp','dns','smb','snmp','rsync','oracle','mysql','mysqlx',
     'mariadb','rdp','postgresql','vnc','redis','weblogic_server','elasticsearch',
     'elasticsearch_transport','memcached','mongodb','mongodb_shard_or_secondary',
     'tftp','nfs','pop3','imap','netbios-ns','msrpc','netbios-ssn','ldap',
     'linux rexec','mssql','oracle db','sybase/db2','ilo','any','oracledb',
     'http','linuxrexec','vnc服务'
-}
+})
+DANGER_TEXT = "危险端口不允许对外开放"
+
+# 解析结果的标准列
+PORT_COLUMNS = ["IP","端口/协议","状态","服务","端口用途"]
 
 # ===========================
 # 校验 IP
 # ===========================
+# IPv4 点分十进制（与 ipaddress 一致：每段 0-255，不允许前导零）
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+IPV4_RE = re.compile(rf"{_OCTET}(?:\.{_OCTET}){{3}}")
+
 def is_valid_ip(ip):
     if not ip:
         return False
-    ipv4_pattern = r"^(25[0-5]|2[0-4]\d|[01]?\d\d?)" \
-                   r"(\.(25[0-5]|2[0-4]\d|[01]?\d\d?)){3}$"
-    ipv6_pattern = r"^([0-9a-fA-F]{0,4}:){2,7}[0-9a-fA-F]{0,4}$"
-    return re.match(ipv4_pattern, ip) or re.match(ipv6_pattern, ip)
+    # 非字符串（如表格中的空值 NaN）按文本判断；IPv4 用预编译正则直接判定，
+    # 只有含 ":" 的候选 IPv6 才交给 ipaddress，避免无效值逐个抛出/捕获 ValueError
+    ip = str(ip)
+    if IPV4_RE.fullmatch(ip):
+        return True
+    if ":" not in ip:
+        return False
+    try:
+        ipaddress.IPv6Address(ip)
+        return True
+    except ValueError:
+        return False
+
+# ===========================
+# 流式遍历 XML 顶层元素
+# ===========================
+def iter_top_level(xml_file):
+    """
+    流式遍历 XML 根节点的直接子元素；
+    每个子元素交给调用方处理后即从根节点移除，内存中只保留当前这一个子元素
+    """
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield elem
+            root.remove(elem)
+
+def root_start_tag(xml_file):
+    """只解析到根元素的开始标签，返回其文本形式（含属性）"""
+    _, root = next(iter(ET.iterparse(xml_file, events=("start",))))
+    attrs = "".join(f" {k}={quoteattr(v)}" for k, v in root.attrib.items())
+    return f"<{root.tag}{attrs}>", root.tag
+
+def to_xml_text(elem):
+    return ET.tostring(elem, encoding="unicode")
 
 # ===========================
 # 合并所有 Nmap XML 文件
 # ===========================
 def merge_all_xml(output_file="out.xml"):
-    xml_files = [f for f in os.listdir(".") if f.lower().endswith(".xml")]
+    # 排除输出文件本身：上次运行残留的 out.xml 不能作为输入，否则会边读边写
+    out_name = os.path.normcase(os.path.basename(output_file))
+    xml_files = [f for f in os.listdir(".")
+                 if f.lower().endswith(".xml") and os.path.normcase(f) != out_name]
     if not xml_files:
         logger.warning("没有找到 XML 文件，跳过合并。")
         return None
 
     logger.info(f"开始合并 {len(xml_files)} 个 XML 文件 -> {output_file}")
-    main_tree = ET.parse(xml_files[0])
-    main_root = main_tree.getroot()
-
-    for xml_file in xml_files[1:]:
-        try:
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            for host in root.findall("host"):
-                main_root.append(host)
-        except Exception as e:
-            logger.error(f"合并文件 {xml_file} 出错: {e}")
-
-    main_tree.write(output_file, encoding="utf-8", xml_declaration=True)
+    # 以第一个文件的根元素为容器：保留其全部顶层内容，再追加其余文件的 <host>；逐个元素流式写出
+    start_tag, root_tag = root_start_tag(xml_files[0])
+    # 先写到临时文件，全部完成后再原子替换为 output_file
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as out:
+        out.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        out.write(start_tag)
+        for i, xml_file in enumerate(xml_files):
+            try:
+                for elem in iter_top_level(xml_file):
+                    if i == 0 or elem.tag == "host":
+                        out.write(to_xml_text(elem))
+            except Exception as e:
+                logger.error(f"合并文件 {xml_file} 出错: {e}")
+        out.write(f"</{root_tag}>")
+    os.replace(tmp_file, output_file)
     logger.info(f"XML 合并完成，结果保存为 {output_file}")
     return output_file
 
@@ -80,22 +154,28 @@ def merge_all_xml(output_file="out.xml"):
 # 解析 Nmap XML
 # ===========================
 def parse_nmap_xml(xml_file):
+    """解析 Nmap XML，返回以 PORT_COLUMNS 为列的 DataFrame"""
     results = []
+    invalid_count = 0
     if not os.path.exists(xml_file):
         logger.warning(f"文件不存在: {xml_file}")
-        return results
+        return pd.DataFrame(columns=PORT_COLUMNS)
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        hosts = root.findall("host")
-        for h_index, host in enumerate(tqdm(hosts, desc=f"解析Nmap: {xml_file}", unit="host")):
+        # 按 <host> 流式解析，不在内存中构建整棵树
+        hosts = (elem for elem in iter_top_level(xml_file) if elem.tag == "host")
+        # 进度条按需开启（设置环境变量 NMAP_PROGRESS），默认不为每个主机刷新；
+        # stderr 不是终端（输出被重定向）时进度条不可见，直接禁用
+        if os.getenv("NMAP_PROGRESS"):
+            hosts = tqdm(hosts, desc=f"解析Nmap: {xml_file}", unit="host",
+                         disable=not sys.stderr.isatty(), mininterval=0.5)
+        for host in hosts:
             ip = None
             addr = host.find("address")
             if addr is not None:
                 ip = addr.get("addr")
 
             if not is_valid_ip(ip):
-                logger.warning(f"[Nmap] 文件 {xml_file} Host#{h_index} IP 无效: {ip}")
+                invalid_count += 1
 
             for port in host.findall(".//port"):
                 proto = port.get("protocol")
@@ -104,68 +184,80 @@ def parse_nmap_xml(xml_file):
                 service_elem = port.find("service")
                 service = service_elem.get("name") if service_elem is not None else ""
 
-                results.append({
-                    "IP": ip,
-                    "端口/协议": f"{portid}/{proto}",
-                    "状态": state,
-                    "服务": service,
-                    "端口用途": "",
-                })
+                results.append((ip, f"{portid}/{proto}", state, service, ""))
     except Exception as e:
         logger.error(f"解析 Nmap 文件 {xml_file} 出错: {e}")
-    return results
+    # IP 无效的主机汇总记录一次，不在循环内逐条输出
+    if invalid_count:
+        logger.warning(f"[Nmap] 文件 {xml_file} 中有 {invalid_count} 个主机 IP 无效")
+    return pd.DataFrame(results, columns=PORT_COLUMNS)
 
 # ===========================
 # 解析 Excel/CSV 表格
 # ===========================
+# 标准列名 -> 表头别名（按优先级）
+COLUMN_ALIASES = {
+    "IP": ["IP","ip","地址","Host"],
+    "端口/协议": ["端口/协议","端口","Port","port"],
+    "状态": ["状态","State","开放状态"],
+    "服务": ["服务","Service","协议"],
+    "端口用途": ["端口用途","用途","备注","Remark"]
+}
+
+@functools.lru_cache(maxsize=32)
+def resolve_columns(columns):
+    """根据表头（列名元组）返回 {实际列名: 标准列名}，每个标准列取第一个出现的别名"""
+    rename_map = {}
+    for std_col, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in columns:
+                rename_map[alias] = std_col
+                break
+    return rename_map
+
 def parse_table(file_path):
-    results = []
+    """解析端口表格（xlsx/csv），返回以 PORT_COLUMNS 为列的 DataFrame"""
+    results = pd.DataFrame(columns=PORT_COLUMNS)
     if not os.path.exists(file_path):
         logger.error(f"文件不存在: {file_path}")
         return results
     try:
-        df = pd.read_excel(file_path) if file_path.lower().endswith(".xlsx") else pd.read_csv(file_path)
+        # 各列最终都按文本处理，直接以字符串读入，省去数值类型推断
+        if file_path.lower().endswith(".xlsx"):
+            df = pd.read_excel(file_path, dtype=str, engine=EXCEL_ENGINE)
+        else:
+            df = pd.read_csv(file_path, dtype=str)
         if df.empty:
             logger.warning(f"文件为空: {file_path}")
             return results
 
-        # 列映射
-        col_map = {
-            "IP": ["IP","ip","地址","Host"],
-            "端口/协议": ["端口/协议","端口","Port","port"],
-            "状态": ["状态","State","开放状态"],
-            "服务": ["服务","Service","协议"],
-            "端口用途": ["端口用途","用途","备注","Remark"]
-        }
-        real_cols = {}
-        for std_col, aliases in col_map.items():
-            for alias in aliases:
-                if alias in df.columns:
-                    real_cols[std_col] = alias
-                    break
-            if std_col not in real_cols:
-                real_cols[std_col] = None
-
-        for i, row in tqdm(df.iterrows(), total=len(df), desc=f"解析表格: {file_path}", unit="行"):
-            ip = row.get(real_cols["IP"], "") if real_cols["IP"] else ""
-            if not is_valid_ip(ip):
-                logger.warning(f"[表格] 文件 {file_path} 行 {i+2} IP 无效: {ip}")
-
-            port_proto = row.get(real_cols["端口/协议"], "") if real_cols["端口/协议"] else ""
-            if port_proto and " /" not in str(port_proto):
-                port_proto = f"{port_proto}/tcp"
-
-            state = row.get(real_cols["状态"], "") if real_cols["状态"] else ""
-            service = row.get(real_cols["服务"], "") if real_cols["服务"] else ""
-            remark = row.get(real_cols["端口用途"], "") if real_cols["端口用途"] else ""
-
-            results.append({
-                "IP": str(ip).strip(),
-                "端口/协议": str(port_proto).strip(),
-                "状态": str(state).strip(),
-                "服务": str(service).strip(),
-                "端口用途": str(remark).strip(),
-            })
+        # 列映射：表头解析结果按列名元组缓存，再一次 rename 成标准列名
+        df = df.rename(columns=resolve_columns(tuple(df.columns)))
+
+        # 按列整体处理，不再逐行 iterrows：缺失的列以空串填充，其余逐值 str() 后去空白
+        def column_text(std_col):
+            if std_col not in df.columns:
+                return pd.Series("", index=df.index, dtype=object)
+            return pd.Series(np.asarray(df[std_col], dtype=object).astype(str), index=df.index)
+
+        invalid = ~df["IP"].map(is_valid_ip) if "IP" in df.columns else pd.Series(True, index=df.index)
+        if invalid.any():
+            logger.warning(f"[表格] 文件 {file_path} 中有 {int(invalid.sum())} 行 IP 无效")
+
+        port_proto = column_text("端口/协议")
+        if "端口/协议" in df.columns:
+            # 非空值且不含 " /" 时补上 "/tcp"
+            truthy = df["端口/协议"].astype(object).astype(bool)
+            need_suffix = truthy & ~port_proto.str.contains(" /", regex=False)
+            port_proto = port_proto.where(~need_suffix, port_proto + "/tcp")
+
+        results = pd.DataFrame({
+            "IP": column_text("IP").str.strip(),
+            "端口/协议": port_proto.str.strip(),
+            "状态": column_text("状态").str.strip(),
+            "服务": column_text("服务").str.strip(),
+            "端口用途": column_text("端口用途").str.strip(),
+        })
     except Exception as e:
         logger.error(f"解析文件 {file_path} 出错: {e}")
     return results
@@ -174,40 +266,77 @@ def parse_table(file_path):
 # 标记危险端口/服务
 # ===========================
 def mark_dangerous(df):
-    def check(row):
-        try:
-            port = int(str(row["端口/协议"]).split("/")[0])
-        except:
-            port = None
-        service = str(row["服务"]).strip().lower()
-        if (port in dangerous_ports) or (service in dangerous_services):
-            return "危险端口不允许对外开放"
-        return ""
-    df["是否必要开放"] = df.apply(check, axis=1)
+    # 整列向量化判断，不再逐行 apply：取 "/" 前的端口号（非整数视为无端口），服务名去空白转小写
+    port_head = df["端口/协议"].astype(str).str.split("/", n=1).str[0].str.strip()
+    port = pd.to_numeric(port_head.where(port_head.str.fullmatch(r"[+-]?\d+", na=False)), errors="coerce")
+    service = df["服务"].astype(str).str.strip().str.lower()
+    mask = port.isin(dangerous_ports) | service.isin(dangerous_services)
+    df["是否必要开放"] = np.where(mask, DANGER_TEXT, "")
     return df
 
 # ===========================
-# Excel 美化
+# Excel 输出（只写模式，边写边设置字体）
 # ===========================
-def format_excel(file_path):
-    wb = load_workbook(file_path)
-    ws = wb.active
-
-    font = Font(name="宋体", size=12)
-    bold_font = Font(name="宋体", size=12, bold=True)
-    red_font = Font(name="宋体", size=12, color="FFFF0000")
-
-    column_widths = {"A":36,"B":12,"C":12,"D":18,"E":11,"F":28}
-    for col, width in column_widths.items():
+FONT = Font(name="宋体", size=12)
+BOLD_FONT = Font(name="宋体", size=12, bold=True)
+RED_FONT = Font(name="宋体", size=12, color="FFFF0000")
+COLUMN_WIDTHS = {"A":36,"B":12,"C":12,"D":18,"E":11,"F":28}
+
+# 行数超过该值且装有 xlsxwriter 时改用 xlsxwriter 写出
+XLSXWRITER_MIN_ROWS = 50_000
+
+def write_excel_xlsxwriter(df, file_path):
+    """xlsxwriter 版本的 write_excel：constant_memory 模式下每写完一行即刷到磁盘，样式与列宽保持一致"""
+    wb = xlsxwriter.Workbook(file_path, {"constant_memory": True, "use_zip64": True, "strings_to_urls": False})
+    ws = wb.add_worksheet("Sheet1")
+    header = wb.add_format({"font_name": "宋体", "font_size": 12, "bold": True})
+    body = wb.add_format({"font_name": "宋体", "font_size": 12})
+    danger = wb.add_format({"font_name": "宋体", "font_size": 12, "font_color": "#FF0000"})
+    for col, width in COLUMN_WIDTHS.items():
+        ws.set_column(f"{col}:{col}", width)
+
+    ws.write_row(0, 0, list(df.columns), header)
+    dcol = df.columns.get_loc("是否必要开放") if "是否必要开放" in df.columns else -1
+    values = df.astype(object).where(df.notna(), None)
+    for i, row in enumerate(values.itertuples(index=False, name=None), start=1):
+        ws.write_row(i, 0, row, body)
+        # 同一行尚未刷盘，可直接覆盖该单元格的格式
+        if dcol >= 0 and row[dcol] == DANGER_TEXT:
+            ws.write(i, dcol, row[dcol], danger)
+    wb.close()
+
+def write_excel(df, file_path):
+    """
+    以 openpyxl 只写模式直接输出结果表：列宽先设好，逐行写出时即带上样式，
+    不再先 to_excel 落盘、再整本读回逐格改字体
+    """
+    if xlsxwriter is not None and len(df) > XLSXWRITER_MIN_ROWS:
+        write_excel_xlsxwriter(df, file_path)
+        return
+    wb = Workbook(write_only=True)
+    # 字体注册为 NamedStyle，单元格只引用样式名
+    wb.add_named_style(NamedStyle(name="header", font=BOLD_FONT))
+    wb.add_named_style(NamedStyle(name="body", font=FONT))
+    wb.add_named_style(NamedStyle(name="danger", font=RED_FONT))
+    ws = wb.create_sheet("Sheet1")
+    for col, width in COLUMN_WIDTHS.items():
         ws.column_dimensions[col].width = width
 
-    for row in ws.iter_rows():
-        for cell in row:
-            cell.font = font
-            if cell.row == 1:
-                cell.font = bold_font
-            if cell.value == "危险端口不允许对外开放":
-                cell.font = red_font
+    def make_cell(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    ws.append([make_cell(h, "header") for h in df.columns])
+    # 危险标记只会出现在“是否必要开放”列，只需检查这一列的值
+    dcol = df.columns.get_loc("是否必要开放") if "是否必要开放" in df.columns else -1
+    # 空值写成空单元格（与 to_excel 一致）
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        cells = [make_cell(v, "body") for v in row]
+        if dcol >= 0 and row[dcol] == DANGER_TEXT:
+            cells[dcol].style = "danger"
+        ws.append(cells)
     wb.save(file_path)
 
 # ===========================
@@ -217,7 +346,9 @@ def auto_dedup(df):
     if df.empty:
         return df, "none"
     before = len(df)
-    df.drop_duplicates(subset=["IP","端口/协议","服务","状态","端口用途"], inplace=True)
+    # 五列合成一个 64 位行哈希，再对这一列做 duplicated，避免逐列 factorize
+    row_hash = pd.util.hash_pandas_object(df[PORT_COLUMNS], index=False)
+    df = df.loc[~row_hash.duplicated()].copy()
     after = len(df)
     mode = f"strict ({before-after} 行被删除)"
     return df, mode
@@ -225,6 +356,9 @@ def auto_dedup(df):
 # ===========================
 # 主函数
 # ===========================
+# 处理完成后要清理的临时文件
+TMP_FILES = ("out.xml", "1.xlsx")
+
 def main():
     current_directory = os.getcwd()
     parent_directory = os.path.dirname(current_directory)
@@ -232,58 +366,61 @@ def main():
     整理结果目录 = os.path.join(parent_directory, "整理结果")
 
     # 创建上级目录中的“整理结果”文件夹（如果不存在）
-    if not os.path.exists(整理结果目录):
-        os.makedirs(整理结果目录)
-        logger.info(f"创建目录: {整理结果目录}")
+    os.makedirs(整理结果目录, exist_ok=True)
 
-    all_results = []
+    # 各解析函数直接返回 DataFrame，最后一次 concat，不再经由逐行 dict 列表重建
+    frames = []
 
     # 第一步：合并 XML
     merged_xml = merge_all_xml("out.xml")
 
     # 第二步：解析 Excel/CSV
     input_file = "开放端口.xlsx"
-    all_results.extend(parse_table(input_file))
+    frames.append(parse_table(input_file))
 
     # 第三步：解析 out.xml
     if merged_xml:
-        all_results.extend(parse_nmap_xml(merged_xml))
+        frames.append(parse_nmap_xml(merged_xml))
 
-    if not all_results:
+    frames = [f for f in frames if not f.empty]
+    if not frames:
         logger.error("未找到可解析数据。")
         return
 
-    df = pd.DataFrame(all_results)
+    df = pd.concat(frames, ignore_index=True)
     df, mode = auto_dedup(df)
     logger.info(f"自动去重模式：{mode}，最终 {len(df)} 行")
 
     df = mark_dangerous(df)
 
     output_file = "端口调研表.xlsx"
-    df.to_excel(output_file, index=False)
-    format_excel(output_file)
+    write_excel(df, output_file)
     logger.info(f"处理完成，结果保存为 {output_file}")
 
     # 第四步：移动到上级目录的“整理结果”文件夹
     target_file = os.path.join(整理结果目录, "端口调研表.xlsx")
     try:
-        if os.path.exists(target_file):
-            os.remove(target_file)
-        shutil.move(output_file, target_file)
+        try:
+            # 同一文件系统内 os.replace 原子覆盖目标，无需先判断存在再删除
+            os.replace(output_file, target_file)
+        except OSError:
+            # 跨文件系统时退回 shutil.move（复制后删除源文件）
+            shutil.move(output_file, target_file)
         logger.info(f"已移动 {output_file} -> {target_file}")
     except Exception as e:
         logger.error(f"移动文件到 {target_file} 失败: {e}")
         return
 
     # 第五步：清理临时文件
-    for tmp_file in ["out.xml", "1.xlsx"]:
+    for tmp_file in TMP_FILES:
         tmp_path = os.path.join(current_directory, tmp_file)
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-                logger.info(f"已删除临时文件: {tmp_path}")
-            except Exception as e:
-                logger.error(f"删除 {tmp_path} 失败: {e}")
+        try:
+            os.remove(tmp_path)
+            logger.info(f"已删除临时文件: {tmp_path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"删除 {tmp_path} 失败: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
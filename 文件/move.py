@@ -1,11 +1,31 @@
 import os
 import re
+import codecs
+import contextlib
+import io
+import shutil
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
 # 匹配规则：文件名中按序出现 r e s u l t（中间可有任意字符），不区分大小写
 RESULT_PATTERN = re.compile(r"r.*?e.*?s.*?u.*?l.*?t", re.I)
 
+# CSV 文件数达到该值才启用多进程读取（文件少时进程启动开销得不偿失）
+PARALLEL_MIN_FILES = 3
+
+# 进程池上限：Windows 的 ProcessPoolExecutor 最多支持 61 个进程，超出会直接抛 ValueError
+MAX_WORKERS = 61
+
+# 探测 CSV 编码时读取的文件头大小
+SNIFF_SIZE = 64 * 1024
+
+# 解压内嵌 ZIP 时的复制缓冲区大小
+COPY_BUFFER_SIZE = 1 << 20
+
+# 多个 HTML 打包的压缩级别：HTML 冗余度高，级别 1 压缩率接近默认的 6，CPU 开销小得多
+HTML_ZIP_LEVEL = 1
+
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
     return path
@@ -28,19 +48,29 @@ def move_file_overwrite(src, dst_dir):
         print(f"[!] 移动失败 {src} -> {target}：{e}")
     return target
 
+def member_target(dst_dir, name):
+    """与 ZipFile.extract 相同的路径清洗：去掉盘符、绝对路径、'.' 与 '..'，防止解压到目标目录之外"""
+    arcname = os.path.splitdrive(name.replace("/", os.sep))[1]
+    parts = [p for p in arcname.split(os.sep) if p not in ("", os.curdir, os.pardir)]
+    return os.path.normpath(os.path.join(dst_dir, *parts))
+
 def extract_and_move_zip(zip_path, rsas_dir):
     """解压 ZIP：若内部有内嵌 ZIP 则提取内嵌 ZIP 到 rsas_dir 并删除源 ZIP；否则移动到 rsas_dir"""
-    inner_zip_found = False
     try:
         with zipfile.ZipFile(zip_path, 'r') as zf:
-            for name in zf.namelist():
-                if name.lower().endswith(".zip"):
-                    inner_zip_found = True
-                    try:
-                        extracted = zf.extract(name, rsas_dir)
-                        print(f"[+] 提取内嵌ZIP: {extracted}")
-                    except Exception as e:
-                        print(f"[!] 提取内嵌ZIP失败 {name}：{e}")
+            # 目录只读一次，先筛出内嵌 ZIP；没有则直接移动，不做任何解压
+            inner_zips = [i for i in zf.infolist() if i.filename.lower().endswith(".zip")]
+            inner_zip_found = bool(inner_zips)
+            for info in inner_zips:
+                target = member_target(rsas_dir, info.filename)
+                try:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    # 流式解压到目标文件，1MB 缓冲（默认仅 16KB 左右），大包吞吐更高
+                    with zf.open(info) as src, open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst, length=COPY_BUFFER_SIZE)
+                    print(f"[+] 提取内嵌ZIP: {target}")
+                except Exception as e:
+                    print(f"[!] 提取内嵌ZIP失败 {info.filename}：{e}")
     except zipfile.BadZipFile:
         print(f"[!] 非法或损坏的 ZIP 文件: {zip_path}")
         return
@@ -54,8 +84,31 @@ def extract_and_move_zip(zip_path, rsas_dir):
     else:
         move_file_overwrite(zip_path, rsas_dir)
 
+def sniff_encoding(path):
+    """根据文件头（BOM 与前 64KB 能否解码）判断编码，顺序与 read_csv_robust 的候选编码一致"""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in ("utf-8", "gbk"):
+        try:
+            # 增量解码（final=False）：截断在多字节字符中间的结尾不算错误
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
 def read_csv_robust(path):
     """尝试使用多种编码读取 CSV，返回 DataFrame 或 None"""
+    # 先按文件头判断出的编码只解析一次；解析失败（如编码问题出现在文件后部）再逐个尝试
+    try:
+        enc = sniff_encoding(path)
+        df = pd.read_csv(path, encoding=enc)
+        print(f"[+] 以编码 {enc} 读取 CSV: {path}")
+        return df
+    except Exception:
+        pass
     encodings = ("utf-8", "utf-8-sig", "gbk", "latin1")
     for enc in encodings:
         try:
@@ -72,6 +125,24 @@ def read_csv_robust(path):
         print(f"[!] 无法读取 CSV 文件 {path}：{e}")
         return None
 
+def read_csv_captured(path):
+    """read_csv_robust 的进程池版本：输出信息随结果一并返回，由主进程按文件顺序打印"""
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        df = read_csv_robust(path)
+    return df, buf.getvalue()
+
+def row_keys(df):
+    """
+    逐行生成去重键：按列名排序的 (列名, 值) 元组，空值列不计入。
+    各文件列不一致时，缺列与空值等价，1 与 1.0 亦视为相同，与合并后整表 drop_duplicates 的判定一致
+    """
+    cols = sorted(df.columns, key=str)
+    values = df[cols].astype(object)
+    values = values.where(values.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield tuple((c, v) for c, v in zip(cols, row) if v is not None)
+
 def merge_csv_files(csv_files, output_file):
     """
     合并 CSV 并去重（整行去重），列不一致时自动补空
@@ -80,20 +151,31 @@ def merge_csv_files(csv_files, output_file):
     if not csv_files:
         print("[*] 没有 CSV 文件需要合并")
         return
-    dfs = []
-    for f in csv_files:
-        df = read_csv_robust(f)
-        if df is None:
-            print(f"[!] 跳过无法读取的文件: {f}")
-            continue
-        dfs.append(df)
-    if not dfs:
+    # 逐文件流式去重：只保留此前未出现过的行，不再先整体 concat 再 drop_duplicates，
+    # 内存中只多出每个唯一行的一个键
+    seen = set()
+    kept = []
+    before = 0
+    # 文件数较多时用进程池并行解析，map 保持输入顺序，去重结果与顺序读取一致
+    parallel = len(csv_files) >= PARALLEL_MIN_FILES and (os.cpu_count() or 1) > 1
+    with (ProcessPoolExecutor(max_workers=min(len(csv_files), os.cpu_count(), MAX_WORKERS)) if parallel
+          else contextlib.nullcontext()) as ex:
+        results = ex.map(read_csv_captured, csv_files) if parallel else map(read_csv_captured, csv_files)
+        for f, (df, log) in zip(csv_files, results):
+            print(log, end="")
+            if df is None:
+                print(f"[!] 跳过无法读取的文件: {f}")
+                continue
+            before += len(df)
+            # 先用 drop_duplicates（C 实现）去掉文件内部重复，只为剩余唯一行生成 Python 键做跨文件去重
+            df = df.drop_duplicates()
+            kept.append(df.loc[[k not in seen and not seen.add(k) for k in row_keys(df)]])
+            del df
+    if not kept:
         print("[*] 没有可用的 DataFrame 可合并")
         return
 
-    combined = pd.concat(dfs, ignore_index=True, sort=False)
-    before = len(combined)
-    combined.drop_duplicates(inplace=True)
+    combined = pd.concat(kept, ignore_index=True, sort=False)
     after = len(combined)
     print(f"[+] 合并完成：合并前行数={before}, 去重后行数={after}")
 
@@ -125,38 +207,40 @@ def main():
     html_files = []
     csv_files_to_merge = []
 
-    for fname in os.listdir(base_dir):
-        fpath = os.path.join(base_dir, fname)
-        if not os.path.isfile(fpath):
-            continue
-        lower_name = fname.lower()
+    # scandir 的 DirEntry 自带文件类型信息，无需对每个文件再 stat 一次；
+    # 先取出全部文件条目再处理，避免边遍历边移动目录内容
+    with os.scandir(base_dir) as it:
+        entries = [entry for entry in it if entry.is_file()]
 
-        # ZIP 文件
-        if lower_name.endswith(".zip"):
-            extract_and_move_zip(fpath, dirs["rsas"])
-            continue
+    # 各扩展名的处理函数
+    def handle_zip(fpath, lower_name):
+        extract_and_move_zip(fpath, dirs["rsas"])
 
-        # HTML 文件
-        if lower_name.endswith(".html"):
-            if "affected" in lower_name:
-                move_file_overwrite(fpath, dirs["awvs"])
-            else:
-                html_files.append(fpath)
-            continue
+    def handle_html(fpath, lower_name):
+        if "affected" in lower_name:
+            move_file_overwrite(fpath, dirs["awvs"])
+        else:
+            html_files.append(fpath)
 
-        # CSV 文件
-        if lower_name.endswith(".csv"):
-            if RESULT_PATTERN.search(lower_name):  # 匹配 result
-                moved = move_file_overwrite(fpath, dirs["整理结果"])
-                csv_files_to_merge.append(moved)
-            else:
-                move_file_overwrite(fpath, dirs["nessus"])
-            continue
+    def handle_csv(fpath, lower_name):
+        if RESULT_PATTERN.search(lower_name):  # 匹配 result
+            moved = move_file_overwrite(fpath, dirs["整理结果"])
+            csv_files_to_merge.append(moved)
+        else:
+            move_file_overwrite(fpath, dirs["nessus"])
 
-        # XML 文件
-        if lower_name.endswith(".xml"):
-            move_file_overwrite(fpath, dirs["nmap"])
-            continue
+    def handle_xml(fpath, lower_name):
+        move_file_overwrite(fpath, dirs["nmap"])
+
+    handlers = {"zip": handle_zip, "html": handle_html, "csv": handle_csv, "xml": handle_xml}
+
+    for entry in entries:
+        lower_name = entry.name.lower()
+        # 一次取出扩展名再查表分派（无 "." 的文件名不属于任何类别）
+        _, dot, ext = lower_name.rpartition(".")
+        handler = handlers.get(ext) if dot else None
+        if handler:
+            handler(entry.path, lower_name)
 
     # 处理 HTML 剩余文件
     if len(html_files) == 1:
@@ -169,7 +253,7 @@ def main():
             except Exception as e:
                 print(f"[!] 无法删除已有压缩包 {zip_target}：{e}")
         try:
-            with zipfile.ZipFile(zip_target, 'w', zipfile.ZIP_DEFLATED) as zf:
+            with zipfile.ZipFile(zip_target, 'w', zipfile.ZIP_DEFLATED, compresslevel=HTML_ZIP_LEVEL) as zf:
                 for h in html_files:
                     zf.write(h, os.path.basename(h))
                     try: